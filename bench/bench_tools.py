@@ -0,0 +1,319 @@
+"""
+Per-tool latency and throughput benchmark against bench/fake_google.py
+Starts the fake Google server and the MCP in http mode as subprocesses, logs users in through
+get_url and /auth/callback, then calls every tool through the FastMCP HTTP app at each concurrency
+level and reports p50/p99 latency, throughput and upstream calls per tool call
+
+    python bench/bench_tools.py [--concurrency 1,8,32] [--calls 64] [--users 16] [--tools list_events,insert_event]
+
+Arguments it does not know are passed on to fake_google.py, e.g. --latency-ms 50 --rate-limit 0.02.
+MCP settings such as RATE_LIMIT_USER_QPS are taken from the environment.
+"""
+import argparse
+import asyncio
+from contextlib import asynccontextmanager
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from fastmcp import Client
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+STARTUP_TIMEOUT = 30
+# Read by the import_calendar scenario from the MCP's ICS_DIR
+IMPORT_FIXTURE = "bench-import.ics"
+IMPORT_FIXTURE_EVENTS = 20
+WATCHED_CALENDAR = "seeded-4@group.calendar.google.com"
+
+class Scenario:
+    """
+    A tool and the arguments for its i-th call by a session, state carries ids between scenarios
+    """
+    def __init__(self, label, tool, arguments, collect=None):
+        self.label = label
+        self.tool = tool
+        self.arguments = arguments
+        self.collect = collect
+
+def take(pool, session_id):
+    # Mutations of owned resources use the ones created earlier by the same session
+    items = pool.get(session_id)
+    return items.pop() if items else "missing"
+
+def peek(pool, session_id, i):
+    items = pool.get(session_id)
+    return items[i % len(items)] if items else "missing"
+
+def collect_ids(pattern, pool):
+    def collect(session_id, text):
+        pool.setdefault(session_id, []).extend(re.findall(pattern, text))
+    return collect
+
+def write_import_fixture(directory):
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//calendar-mcp bench//EN"]
+    for i in range(IMPORT_FIXTURE_EVENTS):
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:bench-import-{i}",
+            "DTSTAMP:20260101T000000Z",
+            f"DTSTART;TZID=America/New_York:202602{i % 28 + 1:02d}T090000",
+            "DURATION:PT45M",
+            f"SUMMARY:Imported event {i}",
+            *(["RRULE:FREQ=WEEKLY;COUNT=4"] if i % 5 == 0 else []),
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    with open(os.path.join(directory, IMPORT_FIXTURE), "w", newline="") as f:
+        f.write("\r\n".join(lines) + "\r\n")
+
+def scenarios():
+    calendars = {}
+    events = {}
+    event = {"time_zone": "UTC", "start_date_time": "2026-02-02T10:00:00", "end_date_time": "2026-02-02T11:00:00"}
+    window = {"time_min": "2026-01-05T00:00:00", "time_max": "2026-01-19T00:00:00"}
+    return [
+        Scenario("get_url", "get_url", lambda s, i: {}),
+        Scenario("verify_login", "verify_login", lambda s, i: {"session_id": s}),
+        Scenario("get_user", "get_user", lambda s, i: {"session_id": s}),
+        Scenario("list_calendars", "list_calendars", lambda s, i: {"session_id": s}),
+        Scenario("list_events", "list_events", lambda s, i: {"session_id": s, "calendar_id": "primary", "output_format": "table"}),
+        Scenario("list_events (window)", "list_events", lambda s, i: {"session_id": s, "calendar_id": "primary", "output_format": "table", **window}),
+        # A calendar of its own, so watching it leaves the unwatched list_events rows as they were
+        Scenario("watch_calendar", "watch_calendar", lambda s, i: {"session_id": s, "calendar_id": WATCHED_CALENDAR}),
+        Scenario("list_events (window, watched)", "list_events", lambda s, i: {
+            "session_id": s, "calendar_id": WATCHED_CALENDAR, "output_format": "table", **window,
+        }),
+        Scenario("find_free_slots", "find_free_slots", lambda s, i: {
+            "session_id": s, "calendar_ids": ["primary", "seeded-1@group.calendar.google.com"], "duration_minutes": 30, **window,
+        }),
+        Scenario("search_events", "search_events", lambda s, i: {"session_id": s, "query": "weekly sync", "output_format": "table"}),
+        Scenario("search_events (window)", "search_events", lambda s, i: {"session_id": s, "query": "room", "output_format": "table", **window}),
+        Scenario("preview_event", "preview_event", lambda s, i: {
+            "session_id": s, "calendar_id": "primary", "repeats": True, "repeat_days": "MO,WE", "final_repeat_date": "2026-03-31T23:59:59", **event,
+        }),
+        Scenario("create_calendar", "create_calendar", lambda s, i: {"session_id": s, "calendar_name": f"Bench {i}"},
+                 collect_ids(r"calendar_id: (\S+)", calendars)),
+        Scenario("patch_calendar", "patch_calendar", lambda s, i: {
+            "session_id": s, "calendar_id": peek(calendars, s, i), "new_calendar_name": f"Bench {i} renamed",
+        }),
+        Scenario("insert_event", "insert_event", lambda s, i: {
+            "session_id": s, "calendar_id": "primary", "event_name": f"Bench event {i}", **event,
+        }, collect_ids(r"event_id: (\S+)", events)),
+        Scenario("insert_event (check_conflicts)", "insert_event", lambda s, i: {
+            "session_id": s, "calendar_id": "primary", "event_name": f"Bench event {i}", "check_conflicts": True, **event,
+        }),
+        Scenario("insert_events (x10)", "insert_events", lambda s, i: {
+            "session_id": s, "calendar_id": "primary", "events": [{"event_name": f"Bench batch {i}.{j}", **event} for j in range(10)],
+        }),
+        Scenario("export_calendar", "export_calendar", lambda s, i: {
+            "session_id": s, "calendar_id": "seeded-2@group.calendar.google.com", "file_path": f"bench-export-{i}.ics",
+        }),
+        Scenario(f"import_calendar (x{IMPORT_FIXTURE_EVENTS})", "import_calendar", lambda s, i: {
+            "session_id": s, "calendar_id": "seeded-3@group.calendar.google.com", "file_path": IMPORT_FIXTURE,
+        }),
+        Scenario("patch_event", "patch_event", lambda s, i: {
+            "session_id": s, "calendar_id": "primary", "event_id": peek(events, s, i), "new_event_name": f"Bench event {i} renamed",
+        }),
+        Scenario("delete_event", "delete_event", lambda s, i: {"session_id": s, "calendar_id": "primary", "event_id": take(events, s)}),
+        Scenario("delete_calendar", "delete_calendar", lambda s, i: {"session_id": s, "calendar_id": take(calendars, s)}),
+    ]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+# Output goes to a file, a pipe nobody reads would stall the server once full
+def start_process(args, env=None, cwd=None):
+    log = tempfile.TemporaryFile()
+    process = subprocess.Popen([sys.executable, *args], cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+    process.log = log
+    return process
+
+async def wait_until_up(http, url, process):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            process.log.seek(0)
+            raise RuntimeError(f"{url} exited during startup:\n{process.log.read().decode()}")
+        try:
+            await http.get(url)
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not start within {STARTUP_TIMEOUT}s")
+
+# A server left over from an earlier run would otherwise be benchmarked instead of the new one
+async def ensure_port_free(http, url):
+    try:
+        await http.get(url)
+    except httpx.TransportError:
+        return
+    raise RuntimeError(f"Something is already listening at {url}")
+
+class Bench:
+    def __init__(self, http, mcp_url, app_url, fake_url):
+        self.http = http
+        self.mcp_url = mcp_url
+        self.app_url = app_url
+        self.fake_url = fake_url
+
+    async def reset_upstream_stats(self):
+        await self.http.post(f"{self.fake_url}/_stats/reset")
+
+    async def upstream_stats(self):
+        stats = (await self.http.get(f"{self.fake_url}/_stats")).json()
+        throttled = stats.pop("throttled", 0) + stats.pop("throttled batch item", 0)
+        # Batch items are counted as part of their batch request
+        stats.pop("batch item", None)
+        return sum(stats.values()), throttled
+
+    async def login(self, client, user):
+        text = (await client.call_tool("get_url", {})).content[0].text
+        session_id = re.search(r"session_id: (\S+)", text).group(1)
+        res = await self.http.get(f"{self.app_url}/auth/callback", params={"code": user, "state": session_id})
+        res.raise_for_status()
+        return session_id
+
+    async def run(self, label, call, calls, concurrency):
+        """
+        Runs calls invocations of call(worker, i) over concurrency workers
+        Returns a result row
+        """
+        await self.reset_upstream_stats()
+        latencies = []
+        errors = 0
+        next_call = 0
+
+        async def worker(w):
+            nonlocal next_call, errors
+            while next_call < calls:
+                i = next_call
+                next_call += 1
+                start = time.perf_counter()
+                ok = await call(w, i)
+                latencies.append(time.perf_counter() - start)
+                errors += not ok
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(w) for w in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        upstream, throttled = await self.upstream_stats()
+        return {
+            "label": label,
+            "concurrency": concurrency,
+            "calls": calls,
+            "errors": errors,
+            "p50": percentile(latencies, 0.5) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "throughput": calls / elapsed,
+            "upstream": upstream / calls,
+            "throttled": throttled,
+        }
+
+def print_rows(rows):
+    print(f"{"tool":32} {"conc":>4} {"calls":>5} {"err":>4} {"p50 ms":>8} {"p99 ms":>8} {"calls/s":>8} {"upstream":>8} {"429/403":>7}")
+    for row in rows:
+        print(
+            f"{row["label"]:32} {row["concurrency"]:4d} {row["calls"]:5d} {row["errors"]:4d} {row["p50"]:8.1f} "
+            f"{row["p99"]:8.1f} {row["throughput"]:8.1f} {row["upstream"]:8.2f} {row["throttled"]:7d}"
+        )
+
+@asynccontextmanager
+async def running_servers(port, fake_port, fake_args):
+    """
+    Starts fake_google.py and the MCP pointed at it, yielding a Bench once both answer
+    """
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    app_url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "MODE": "http",
+        "PORT": str(port),
+        "DOMAIN": app_url,
+        "CLIENT_ID": "bench",
+        "CLIENT_SECRET": "bench",
+        "CALENDAR_API": f"{fake_url}/calendar/v3",
+        "CALENDAR_BATCH_API": f"{fake_url}/batch/calendar/v3",
+        "TOKEN_URL": f"{fake_url}/token",
+        "JWKS_URL": f"{fake_url}/certs",
+    }
+    ics_dir = tempfile.TemporaryDirectory()
+    write_import_fixture(ics_dir.name)
+    env["ICS_DIR"] = ics_dir.name
+    fake = app = None
+    try:
+        async with httpx.AsyncClient(timeout=60) as http:
+            await ensure_port_free(http, fake_url)
+            await ensure_port_free(http, app_url)
+            fake = start_process([os.path.join(BENCH_DIR, "fake_google.py"), "--port", str(fake_port), *fake_args])
+            await wait_until_up(http, f"{fake_url}/_stats", fake)
+            app = start_process(["main.py"], env=env, cwd=SRC_DIR)
+            await wait_until_up(http, f"{app_url}/auth/callback", app)
+            yield Bench(http, f"{app_url}/mcp/", app_url, fake_url)
+    finally:
+        for process in (app, fake):
+            if process is not None:
+                process.terminate()
+                process.wait()
+                process.log.close()
+        ics_dir.cleanup()
+
+@asynccontextmanager
+async def connected_clients(url, count):
+    clients = [Client(url, timeout=120) for _ in range(count)]
+    try:
+        for client in clients:
+            await client.__aenter__()
+        yield clients
+    finally:
+        for client in clients:
+            await client.__aexit__(None, None, None)
+
+async def bench(args, fake_args):
+    async with running_servers(args.port, args.fake_port, fake_args) as b, connected_clients(b.mcp_url, max(args.concurrency)) as clients:
+        rows = []
+        login_calls = max(args.calls, args.users)
+        for concurrency in args.concurrency:
+            sessions = []
+
+            async def login(w, i):
+                try:
+                    sessions.append(await b.login(clients[w], f"bench-user-{i % args.users}"))
+                    return True
+                except Exception:
+                    return False
+
+            # Each call is a get_url plus the callback, the row is what a user waits for to log in
+            rows.append(await b.run("login (get_url + callback)", login, login_calls, concurrency))
+            for scenario in scenarios():
+                if args.tools and scenario.tool not in args.tools:
+                    continue
+
+                async def call(w, i, scenario=scenario):
+                    session_id = sessions[i % len(sessions)]
+                    result = await clients[w].call_tool(scenario.tool, scenario.arguments(session_id, i), raise_on_error=False)
+                    if scenario.collect and not result.is_error:
+                        scenario.collect(session_id, result.content[0].text)
+                    return not result.is_error
+
+                rows.append(await b.run(scenario.label, call, args.calls, concurrency))
+        print_rows(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 8, 32])
+    parser.add_argument("--calls", type=int, default=64, help="calls per tool and concurrency level")
+    parser.add_argument("--users", type=int, default=16, help="distinct Google users the calls are spread over")
+    parser.add_argument("--tools", type=lambda v: set(v.split(",")), default=None, help="comma separated tools to run (default all)")
+    parser.add_argument("--port", type=int, default=8801, help="port for the MCP")
+    parser.add_argument("--fake-port", type=int, default=8800, help="port for fake_google.py")
+    args, fake_args = parser.parse_known_args()
+    asyncio.run(bench(args, fake_args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+"""
+Stand-in for the Google Calendar v3, batch, OAuth token and signing key endpoints, for offline benchmarks
+Every user shares one seeded dataset, any authorization code logs in as the user named by the code
+and comes back with an RS256 id_token signed by a key served at /certs
+
+    python bench/fake_google.py [--port 8800] [--latency-ms 20] [--page-size 250] [--rate-limit 0.01]
+                                [--quota-qps 10] [--calendars 5] [--events 500] [--key-rotation 60]
+
+Point the MCP at it with
+    CALENDAR_API=http://127.0.0.1:8800/calendar/v3
+    CALENDAR_BATCH_API=http://127.0.0.1:8800/batch/calendar/v3
+    TOKEN_URL=http://127.0.0.1:8800/token
+    JWKS_URL=http://127.0.0.1:8800/certs
+
+Calls served per endpoint are reported by GET /_stats and cleared by POST /_stats/reset
+Watch channels are listed by GET /_channels and POST /_touch/{calendar_id} changes a calendar behind the
+MCP's back, the fake never pushes notifications itself, bench/push_notifications.py sends them
+"""
+import argparse
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+import json
+import random
+import time
+from urllib.parse import unquote
+import uuid
+from zoneinfo import ZoneInfo
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+import jwt
+from jwt.algorithms import RSAAlgorithm
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+API_PREFIX = "/calendar/v3"
+# Seeded events are spread over this many days from DATASET_START
+DATASET_START = datetime(2026, 1, 5, tzinfo=timezone.utc)
+DATASET_DAYS = 90
+MAX_PAGE_SIZE = 2500
+ISSUER = "https://accounts.google.com"
+# Retired signing keys stay published this long, like Google's overlapping rotation
+PUBLISHED_KEYS = 2
+
+def error(status, reason, message):
+    return status, {"error": {"code": status, "message": message, "errors": [{"domain": "global", "reason": reason, "message": message}]}}
+
+def parse_time(value):
+    tz = ZoneInfo(value.get("timeZone", "UTC"))
+    if "dateTime" in value:
+        parsed = datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+        # Like Google, a dateTime without an offset is read in the event's timeZone
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=tz)
+    return datetime.fromisoformat(value["date"]).replace(tzinfo=tz)
+
+class FakeGoogle:
+    """
+    In-memory calendars and events with ETags, paginated listings, sync tokens and
+    optional latency, random throttling and a per-token quota
+    """
+    def __init__(self, latency=0.0, jitter=0.0, page_size=250, rate_limit=0.0, quota_qps=0.0,
+                 calendars=5, events=500, token_ttl=3600, jwks_max_age=3600, key_rotation=0.0,
+                 max_channel_ttl=604800, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.page_size = page_size
+        self.rate_limit = rate_limit
+        self.quota_qps = quota_qps
+        self.token_ttl = token_ttl
+        self.jwks_max_age = jwks_max_age
+        self.key_rotation = key_rotation
+        self.max_channel_ttl = max_channel_ttl
+        self.channels = {}
+        self.signing_keys = []
+        self._rotated_at = 0
+        self.random = random.Random(seed)
+        self.stats = Counter()
+        self.version = 0
+        self.list_version = 0
+        self.calendars = {}
+        self.events = {}
+        self.access_tokens = {}
+        self.refresh_tokens = {}
+        self._quota = {}
+        self._seed(calendars, events)
+
+    # Newest key first, a new one is generated every key_rotation seconds
+    def _signing_key(self):
+        if not self.signing_keys or (self.key_rotation and time.monotonic() - self._rotated_at >= self.key_rotation):
+            key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+            self.signing_keys = [(uuid.uuid4().hex, key), *self.signing_keys][:PUBLISHED_KEYS]
+            self._rotated_at = time.monotonic()
+        return self.signing_keys[0]
+
+    def _id_token(self, sub, audience):
+        kid, key = self._signing_key()
+        now = int(time.time())
+        claims = {
+            "iss": ISSUER, "aud": audience, "sub": sub, "iat": now, "exp": now + 3600,
+            "email": f"{sub}@example.com", "email_verified": True, "name": sub,
+        }
+        return jwt.encode(claims, key, algorithm="RS256", headers={"kid": kid})
+
+    def _next_etag(self):
+        self.version += 1
+        return f'"{self.version}"'
+
+    def _seed(self, calendar_count, event_count):
+        for i in range(calendar_count):
+            calendar_id = "primary" if i == 0 else f"seeded-{i}@group.calendar.google.com"
+            self.calendars[calendar_id] = {"id": calendar_id, "summary": f"Calendar {i}", "etag": self._next_etag()}
+            self.events[calendar_id] = {}
+        calendar_ids = list(self.calendars)
+        for i in range(event_count):
+            start = DATASET_START + timedelta(
+                days=self.random.randrange(DATASET_DAYS),
+                minutes=self.random.randrange(8 * 60, 18 * 60, 15),
+            )
+            event = {
+                "summary": f"Meeting {i}",
+                "description": self.random.choice(["", "Weekly sync", "Planning", "Review notes"]),
+                "location": self.random.choice(["", "Room 1", "Room 2", "Online"]),
+                "start": {"dateTime": start.isoformat(), "timeZone": "UTC"},
+                "end": {"dateTime": (start + timedelta(minutes=self.random.choice([30, 45, 60, 90]))).isoformat(), "timeZone": "UTC"},
+            }
+            if self.random.random() < 0.1:
+                event["recurrence"] = [f"RRULE:FREQ=WEEKLY;COUNT={self.random.randrange(2, 12)}"]
+            self._insert_event(calendar_ids[i % len(calendar_ids)], event)
+
+    def _insert_event(self, calendar_id, body):
+        event = {key: value for key, value in body.items() if key not in ("id", "etag", "status")}
+        event.update(id=uuid.uuid4().hex, status="confirmed", etag=self._next_etag())
+        event.setdefault("iCalUID", f"{event["id"]}@google.com")
+        event["_version"] = self.version
+        self.events[calendar_id][event["id"]] = event
+        return event
+
+    # Strips the bookkeeping fields before an event is served
+    def _public(self, event):
+        return {key: value for key, value in event.items() if not key.startswith("_")}
+
+    def _authorize(self, request):
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        grant = self.access_tokens.get(token)
+        if grant is None or grant[1] < time.time():
+            return None
+        return token
+
+    def _throttle(self, token):
+        if self.rate_limit and self.random.random() < self.rate_limit:
+            if self.random.random() < 0.5:
+                return 429, {"error": {"code": 429, "message": "Too Many Requests"}}, {"Retry-After": "1"}
+            return (*error(403, "rateLimitExceeded", "Rate Limit Exceeded"), {})
+        if self.quota_qps:
+            tokens, updated = self._quota.get(token, (self.quota_qps, time.monotonic()))
+            now = time.monotonic()
+            tokens = min(self.quota_qps, tokens + (now - updated) * self.quota_qps)
+            if tokens < 1:
+                self._quota[token] = (tokens, now)
+                return (*error(403, "userRateLimitExceeded", "User Rate Limit Exceeded"), {})
+            self._quota[token] = (tokens - 1, now)
+        return None
+
+    async def _delay(self):
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+
+    # Wraps an endpoint with latency, call counting, authorization and throttling
+    def endpoint(self, label, handler, authorized=True):
+        async def endpoint(request):
+            self.stats[f"{request.method} {label}"] += 1
+            await self._delay()
+            headers = {}
+            if authorized:
+                token = self._authorize(request)
+                if token is None:
+                    status, body = error(401, "authError", "Invalid Credentials")
+                    return JSONResponse(body, status_code=status)
+                throttled = self._throttle(token)
+                if throttled is not None:
+                    self.stats["throttled"] += 1
+                    status, body, headers = throttled
+                    return JSONResponse(body, status_code=status, headers=headers)
+            result = await handler(request)
+            if isinstance(result, Response):
+                return result
+            status, body, *rest = result
+            headers = rest[0] if rest else {}
+            if status == 304 or body is None:
+                return Response(status_code=status, headers=headers)
+            return JSONResponse(body, status_code=status, headers=headers)
+        return endpoint
+
+    async def token(self, request):
+        form = await request.form()
+        if form.get("grant_type") == "authorization_code":
+            sub = form.get("code") or uuid.uuid4().hex
+            refresh_token = f"refresh-{uuid.uuid4().hex}"
+            self.refresh_tokens[refresh_token] = sub
+        elif form.get("grant_type") == "refresh_token":
+            refresh_token = form.get("refresh_token")
+            sub = self.refresh_tokens.get(refresh_token)
+            if sub is None:
+                return 400, {"error": "invalid_grant"}
+        else:
+            return 400, {"error": "unsupported_grant_type"}
+        access_token = f"access-{uuid.uuid4().hex}"
+        self.access_tokens[access_token] = (sub, time.time() + self.token_ttl)
+        body = {"access_token": access_token, "expires_in": self.token_ttl, "token_type": "Bearer"}
+        if form.get("grant_type") == "authorization_code":
+            body["refresh_token"] = refresh_token
+            body["id_token"] = self._id_token(sub, form.get("client_id"))
+        return 200, body
+
+    async def certs(self, request):
+        self._signing_key()
+        keys = [{**RSAAlgorithm.to_jwk(key.public_key(), as_dict=True), "kid": kid, "alg": "RS256", "use": "sig"} for kid, key in self.signing_keys]
+        return 200, {"keys": keys}, {"Cache-Control": f"public, max-age={self.jwks_max_age}"}
+
+    async def calendar_list(self, request):
+        etag = f'"list-{self.list_version}"'
+        if request.headers.get("If-None-Match") == etag:
+            return 304, None, {"ETag": etag}
+        items = [{"id": c["id"], "summary": c["summary"]} for c in self.calendars.values()]
+        page, next_token = self._page(items, request.query_params)
+        body = {"etag": etag, "items": page}
+        if next_token:
+            body["nextPageToken"] = next_token
+        return 200, body, {"ETag": etag}
+
+    def _page(self, items, params):
+        size = min(int(params.get("maxResults", self.page_size)), self.page_size, MAX_PAGE_SIZE)
+        offset = int(params.get("pageToken", "0"))
+        end = offset + size
+        return items[offset:end], (str(end) if end < len(items) else None)
+
+    async def insert_calendar(self, request):
+        body = await request.json()
+        calendar_id = f"{uuid.uuid4().hex}@group.calendar.google.com"
+        self.calendars[calendar_id] = {**body, "id": calendar_id, "etag": self._next_etag()}
+        self.list_version += 1
+        self.events[calendar_id] = {}
+        return 200, self.calendars[calendar_id]
+
+    async def calendar(self, request):
+        calendar_id = request.path_params["calendar_id"]
+        calendar = self.calendars.get(calendar_id)
+        if calendar is None:
+            return error(404, "notFound", "Not Found")
+        if request.method == "GET":
+            return 200, calendar
+        if request.headers.get("If-Match", calendar["etag"]) != calendar["etag"]:
+            return error(412, "conditionNotMet", "Precondition Failed")
+        if request.method == "DELETE":
+            del self.calendars[calendar_id]
+            del self.events[calendar_id]
+            self.list_version += 1
+            return 204, None
+        calendar.update(await request.json())
+        calendar["etag"] = self._next_etag()
+        self.list_version += 1
+        return 200, calendar
+
+    async def list_events(self, request):
+        calendar_id = request.path_params["calendar_id"]
+        if calendar_id not in self.events:
+            return error(404, "notFound", "Not Found")
+        params = request.query_params
+        events = self.events[calendar_id].values()
+        if "syncToken" in params:
+            since = int(params["syncToken"])
+            events = [e for e in events if e["_version"] > since]
+        else:
+            events = [e for e in events if e["status"] != "cancelled"]
+            if "timeMin" in params:
+                time_min = datetime.fromisoformat(params["timeMin"].replace("Z", "+00:00"))
+                # Recurring events are kept whole rather than expanded
+                events = [e for e in events if "recurrence" in e or parse_time(e["end"]) > time_min]
+            if "timeMax" in params:
+                time_max = datetime.fromisoformat(params["timeMax"].replace("Z", "+00:00"))
+                events = [e for e in events if parse_time(e["start"]) < time_max]
+        events = sorted(events, key=lambda e: e["_version"])
+        page, next_token = self._page([self._public(e) for e in events], params)
+        body = {"items": page}
+        if next_token:
+            body["nextPageToken"] = next_token
+        else:
+            body["nextSyncToken"] = str(self.version)
+        return 200, body
+
+    async def insert_event(self, request):
+        calendar_id = request.path_params["calendar_id"]
+        if calendar_id not in self.events:
+            return error(404, "notFound", "Not Found")
+        return 200, self._public(self._insert_event(calendar_id, await request.json()))
+
+    async def event(self, request):
+        event = self.events.get(request.path_params["calendar_id"], {}).get(request.path_params["event_id"])
+        if event is None or (event["status"] == "cancelled" and request.method != "GET"):
+            return error(404, "notFound", "Not Found")
+        if request.method == "GET":
+            return 200, self._public(event)
+        if request.headers.get("If-Match", event["etag"]) != event["etag"]:
+            return error(412, "conditionNotMet", "Precondition Failed")
+        if request.method == "DELETE":
+            # Kept as a tombstone so sync tokens report the deletion
+            event["status"] = "cancelled"
+        else:
+            event.update(await request.json())
+        event["etag"] = self._next_etag()
+        event["_version"] = self.version
+        return (204, None) if request.method == "DELETE" else (200, self._public(event))
+
+    async def free_busy(self, request):
+        body = await request.json()
+        time_min = datetime.fromisoformat(body["timeMin"].replace("Z", "+00:00"))
+        time_max = datetime.fromisoformat(body["timeMax"].replace("Z", "+00:00"))
+        calendars = {}
+        for item in body.get("items", []):
+            events = self.events.get(item["id"])
+            if events is None:
+                calendars[item["id"]] = {"errors": [{"domain": "global", "reason": "notFound"}]}
+                continue
+            busy = []
+            for event in events.values():
+                if event["status"] == "cancelled":
+                    continue
+                start, end = parse_time(event["start"]), parse_time(event["end"])
+                if start < time_max and end > time_min:
+                    busy.append({"start": start.isoformat(), "end": end.isoformat()})
+            calendars[item["id"]] = {"busy": busy}
+        return 200, {"kind": "calendar#freeBusy", "calendars": calendars}
+
+    # Only event inserts are supported inside a batch, which is all the MCP sends
+    # Each item counts against the quota and can be throttled on its own, as Google does
+    async def batch(self, request):
+        content_type = request.headers.get("content-type", "")
+        boundary = content_type.partition("boundary=")[2].strip('"')
+        if not boundary:
+            return error(400, "badRequest", "Missing multipart boundary")
+        text = (await request.body()).decode()
+        token = self._authorize(request)
+        response_boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for part in text.split(f"--{boundary}"):
+            part = part.strip()
+            if not part or part == "--":
+                continue
+            outer_headers, _, inner = part.replace("\r\n", "\n").partition("\n\n")
+            content_id = next(
+                (line.partition(":")[2].strip().strip("<>") for line in outer_headers.split("\n") if line.lower().startswith("content-id")),
+                "",
+            )
+            request_line, _, rest = inner.partition("\n")
+            _, _, payload = rest.partition("\n\n")
+            method, path, _ = request_line.split(" ", 2)
+            self.stats["batch item"] += 1
+            segments = unquote(path).removeprefix(API_PREFIX).strip("/").split("/")
+            throttled = self._throttle(token)
+            if throttled is not None:
+                self.stats["throttled batch item"] += 1
+                status, body = throttled[:2]
+            elif method == "POST" and len(segments) == 3 and segments[0] == "calendars" and segments[2] == "events" and segments[1] in self.events:
+                status, body = 200, self._public(self._insert_event(segments[1], json.loads(payload)))
+            else:
+                status, body = error(404, "notFound", "Not Found")
+            parts.append(
+                f"--{response_boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n"
+                "\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                "Content-Type: application/json\r\n"
+                "\r\n"
+                f"{json.dumps(body)}\r\n"
+            )
+        parts.append(f"--{response_boundary}--\r\n")
+        return Response("".join(parts), media_type=f"multipart/mixed; boundary={response_boundary}")
+
+    async def watch(self, request):
+        calendar_id = request.path_params["calendar_id"]
+        if calendar_id not in self.events:
+            return error(404, "notFound", "Not Found")
+        body = await request.json()
+        if body.get("type") != "web_hook" or not body.get("id") or not body.get("address"):
+            return error(400, "badRequest", "Invalid channel")
+        ttl = min(int(body.get("params", {}).get("ttl", self.max_channel_ttl)), self.max_channel_ttl)
+        channel = {
+            "kind": "api#channel",
+            "id": body["id"],
+            "resourceId": f"resource-{calendar_id}",
+            "resourceUri": f"{API_PREFIX}/calendars/{calendar_id}/events",
+            "token": body.get("token", ""),
+            "expiration": str(int((time.time() + ttl) * 1000)),
+        }
+        self.channels[body["id"]] = {**channel, "address": body["address"], "calendarId": calendar_id}
+        return 200, channel
+
+    async def stop_channel(self, request):
+        body = await request.json()
+        channel = self.channels.get(body.get("id"))
+        if channel is None or channel["resourceId"] != body.get("resourceId"):
+            return error(404, "notFound", "Channel not found")
+        del self.channels[body["id"]]
+        return 204, None
+
+    async def get_channels(self, request):
+        return JSONResponse(list(self.channels.values()))
+
+    # Inserts an event as another client would, so the next delta sync has something to pick up
+    async def touch(self, request):
+        calendar_id = request.path_params["calendar_id"]
+        if calendar_id not in self.events:
+            return JSONResponse(error(404, "notFound", "Not Found")[1], status_code=404)
+        start = DATASET_START + timedelta(days=self.random.randrange(DATASET_DAYS), hours=12)
+        event = self._insert_event(calendar_id, {
+            "summary": f"Changed elsewhere {self.version}",
+            "start": {"dateTime": start.isoformat(), "timeZone": "UTC"},
+            "end": {"dateTime": (start + timedelta(minutes=30)).isoformat(), "timeZone": "UTC"},
+        })
+        return JSONResponse(self._public(event))
+
+    async def get_stats(self, request):
+        return JSONResponse(dict(self.stats))
+
+    async def reset_stats(self, request):
+        self.stats.clear()
+        return Response(status_code=204)
+
+    def app(self):
+        e = self.endpoint
+        return Starlette(routes=[
+            Route("/token", e("token", self.token, authorized=False), methods=["POST"]),
+            Route("/certs", e("certs", self.certs, authorized=False), methods=["GET"]),
+            Route(f"{API_PREFIX}/users/me/calendarList", e("calendarList", self.calendar_list), methods=["GET"]),
+            Route(f"{API_PREFIX}/calendars", e("calendars", self.insert_calendar), methods=["POST"]),
+            Route(f"{API_PREFIX}/calendars/{{calendar_id}}", e("calendar", self.calendar), methods=["GET", "PATCH", "DELETE"]),
+            Route(f"{API_PREFIX}/calendars/{{calendar_id}}/events", e("events", self.list_events), methods=["GET"]),
+            Route(f"{API_PREFIX}/calendars/{{calendar_id}}/events", e("events", self.insert_event), methods=["POST"]),
+            Route(f"{API_PREFIX}/calendars/{{calendar_id}}/events/{{event_id}}", e("event", self.event), methods=["GET", "PATCH", "DELETE"]),
+            Route(f"{API_PREFIX}/calendars/{{calendar_id}}/events/watch", e("watch", self.watch), methods=["POST"]),
+            Route(f"{API_PREFIX}/channels/stop", e("channels/stop", self.stop_channel), methods=["POST"]),
+            Route(f"{API_PREFIX}/freeBusy", e("freeBusy", self.free_busy), methods=["POST"]),
+            Route("/batch/calendar/v3", e("batch", self.batch), methods=["POST"]),
+            Route("/_stats", self.get_stats, methods=["GET"]),
+            Route("/_stats/reset", self.reset_stats, methods=["POST"]),
+            Route("/_channels", self.get_channels, methods=["GET"]),
+            Route("/_touch/{calendar_id}", self.touch, methods=["POST"]),
+        ])
+
+def add_arguments(parser):
+    parser.add_argument("--latency-ms", type=float, default=20, help="added to every upstream call")
+    parser.add_argument("--jitter-ms", type=float, default=10, help="uniform random latency on top of --latency-ms")
+    parser.add_argument("--page-size", type=int, default=250, help="largest page served by listings")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of calls answered with 429 or 403 rateLimitExceeded")
+    parser.add_argument("--quota-qps", type=float, default=0.0, help="per token quota answered with 403 userRateLimitExceeded, 0 for none")
+    parser.add_argument("--calendars", type=int, default=5, help="seeded calendars")
+    parser.add_argument("--events", type=int, default=500, help="seeded events spread across the calendars")
+    parser.add_argument("--token-ttl", type=int, default=3600, help="access token lifetime in seconds")
+    parser.add_argument("--jwks-max-age", type=int, default=3600, help="Cache-Control max-age of /certs")
+    parser.add_argument("--key-rotation", type=float, default=0, help="seconds between id_token signing key rotations, 0 for none")
+    parser.add_argument("--max-channel-ttl", type=int, default=604800, help="longest watch channel lifetime granted, in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+
+def from_arguments(args):
+    return FakeGoogle(
+        latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, page_size=args.page_size,
+        rate_limit=args.rate_limit, quota_qps=args.quota_qps, calendars=args.calendars,
+        events=args.events, token_ttl=args.token_ttl, jwks_max_age=args.jwks_max_age,
+        key_rotation=args.key_rotation, max_channel_ttl=args.max_channel_ttl, seed=args.seed,
+    )
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8800)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(from_arguments(args).app(), host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Login storm check for the OAuth callback
+Runs many concurrent logins (get_url then /auth/callback) against bench/fake_google.py while a probe
+keeps calling verify_login, then checks every session logged in, that the signing keys were fetched
+once per rotation rather than once per login, and how far tool latency moved during the storm
+
+    python bench/login_storm.py [--logins 500] [--concurrency 100]
+
+Arguments it does not know are passed on to fake_google.py, e.g. --latency-ms 100 --key-rotation 1.
+Exits non-zero when a login fails.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from bench_tools import connected_clients, percentile, running_servers
+
+async def probe(client, session_id, latencies, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.call_tool("verify_login", {"session_id": session_id})
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+
+async def storm(args, fake_args):
+    async with running_servers(args.port, args.fake_port, fake_args) as b, connected_clients(b.mcp_url, args.concurrency + 1) as clients:
+        probe_client, clients = clients[0], clients[1:]
+        probe_session = await b.login(probe_client, "probe")
+
+        baseline = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(probe_client, probe_session, baseline, stop))
+        await asyncio.sleep(1)
+        stop.set()
+        await task
+
+        sessions = []
+        during = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(probe_client, probe_session, during, stop))
+
+        async def login(w, i):
+            try:
+                sessions.append(await b.login(clients[w], f"storm-user-{i}"))
+                return True
+            except Exception:
+                return False
+
+        row = await b.run("login", login, args.logins, args.concurrency)
+        stop.set()
+        await task
+        stats = (await b.http.get(f"{b.fake_url}/_stats")).json()
+
+        logged_in = 0
+        for session_id in sessions:
+            text = (await probe_client.call_tool("verify_login", {"session_id": session_id})).content[0].text
+            logged_in += "True" in text
+
+        print(f"{args.logins} logins at concurrency {args.concurrency}")
+        print(f"  succeeded           {logged_in}/{args.logins} ({row["errors"]} callback errors)")
+        print(f"  login p50 / p99     {row["p50"]:8.1f} / {row["p99"]:8.1f} ms")
+        print(f"  throughput          {row["throughput"]:8.1f} logins/s")
+        print(f"  token requests      {stats.get("POST token", 0)}")
+        print(f"  signing key fetches {stats.get("GET certs", 0)} (keys were cached by the probe login before the storm)")
+        print(f"  verify_login p99    {percentile(baseline, 0.99) * 1000:8.1f} ms idle, {percentile(during, 0.99) * 1000:8.1f} ms during the storm")
+        return logged_in == args.logins
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--port", type=int, default=8801, help="port for the MCP")
+    parser.add_argument("--fake-port", type=int, default=8800, help="port for fake_google.py")
+    args, fake_args = parser.parse_known_args()
+    if not asyncio.run(storm(args, fake_args)):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
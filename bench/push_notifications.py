@@ -0,0 +1,79 @@
+"""
+Simulated Google push notification sender for watch_calendar
+Reads the channels the MCP opened on bench/fake_google.py and posts notifications to their webhook
+addresses the way Google does, then reports how the webhook answered
+
+    python bench/push_notifications.py [--fake-url http://127.0.0.1:8800] [--count 1] [--concurrency 20]
+                                       [--change] [--forged]
+
+--change first changes every watched calendar on the fake, so the notified MCP has a delta to fetch.
+--forged also sends each notification with a tampered channel token, which must be rejected.
+Exits non-zero when a genuine notification is rejected or a forged one accepted.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+
+from bench_tools import percentile
+
+def headers(channel, number, state="exists"):
+    return {
+        "X-Goog-Channel-ID": channel["id"],
+        "X-Goog-Channel-Token": channel["token"],
+        "X-Goog-Channel-Expiration": time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(int(channel["expiration"]) / 1000)),
+        "X-Goog-Resource-ID": channel["resourceId"],
+        "X-Goog-Resource-URI": channel["resourceUri"],
+        "X-Goog-Resource-State": state,
+        "X-Goog-Message-Number": str(number),
+    }
+
+async def send(args):
+    async with httpx.AsyncClient(timeout=10) as http:
+        channels = (await http.get(f"{args.fake_url}/_channels")).json()
+        if not channels:
+            print("No watch channels are open, call watch_calendar first")
+            return False
+        if args.change:
+            for channel in channels:
+                (await http.post(f"{args.fake_url}/_touch/{channel["calendarId"]}")).raise_for_status()
+
+        jobs = [(channel, headers(channel, i + 1), True) for channel in channels for i in range(args.count)]
+        if args.forged:
+            jobs.extend((channel, {**headers(channel, 1), "X-Goog-Channel-Token": channel["token"][:-4] + "0000"}, False) for channel in channels)
+        queue = iter(jobs)
+        latencies = []
+        wrong = []
+
+        async def worker():
+            for channel, notification, genuine in queue:
+                start = time.perf_counter()
+                res = await http.post(channel["address"], headers=notification)
+                latencies.append(time.perf_counter() - start)
+                if res.is_success != genuine:
+                    wrong.append(f"{"genuine" if genuine else "forged"} notification for {channel["calendarId"]} answered {res.status_code}")
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+    print(f"{len(jobs)} notifications to {len(channels)} channels")
+    print(f"  webhook p50 / p99   {percentile(latencies, 0.5) * 1000:8.1f} / {percentile(latencies, 0.99) * 1000:8.1f} ms")
+    print(f"  answered wrongly    {len(wrong)}")
+    for line in wrong[:10]:
+        print(f"    {line}")
+    return not wrong
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fake-url", default="http://127.0.0.1:8800")
+    parser.add_argument("--count", type=int, default=1, help="notifications sent to each channel")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--change", action="store_true", help="change each watched calendar before notifying")
+    parser.add_argument("--forged", action="store_true", help="also send notifications with tampered tokens")
+    args = parser.parse_args()
+    if not asyncio.run(send(args)):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Cold-start benchmark for stdio mode
+Spawns src/main.py the way an MCP client does and times process start until the
+tools/list response arrives
+
+    python bench/startup.py [--runs 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+def rpc(message):
+    return (json.dumps(message) + "\n").encode()
+
+def measure_once():
+    messages = [
+        rpc({"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+            "protocolVersion": "2025-06-18",
+            "capabilities": {},
+            "clientInfo": {"name": "startup-bench", "version": "1"},
+        }}),
+        rpc({"jsonrpc": "2.0", "method": "notifications/initialized"}),
+        rpc({"jsonrpc": "2.0", "id": 2, "method": "tools/list"}),
+    ]
+    env = {**os.environ, "MODE": "stdio"}
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=SRC_DIR,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        proc.stdin.write(b"".join(messages))
+        proc.stdin.flush()
+        for line in proc.stdout:
+            response = json.loads(line)
+            if response.get("id") == 2:
+                elapsed = time.perf_counter() - start
+                return elapsed, len(response["result"]["tools"])
+        raise RuntimeError("Server exited before answering tools/list")
+    finally:
+        proc.kill()
+        proc.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.runs):
+        elapsed, tool_count = measure_once()
+        timings.append(elapsed * 1000)
+    print(f"cold start to tools/list ({tool_count} tools, {args.runs} runs)")
+    print(f"  min    {min(timings):8.1f} ms")
+    print(f"  median {statistics.median(timings):8.1f} ms")
+    print(f"  max    {max(timings):8.1f} ms")
+
+if __name__ == "__main__":
+    main()
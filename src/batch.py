@@ -0,0 +1,79 @@
+import json
+import os
+import uuid
+from urllib.parse import urlsplit
+
+BATCH_API = os.getenv("CALENDAR_BATCH_API", "https://www.googleapis.com/batch/calendar/v3")
+MAX_BATCH_SIZE = 50
+
+def build_batch(requests, api_base):
+    """
+    Build a multipart/mixed body from (method, path, json) tuples
+    Paths are relative to api_base, which only contributes its path component
+    Returns (content_type, body)
+    """
+    boundary = f"batch_{uuid.uuid4().hex}"
+    api_path = urlsplit(api_base).path
+    parts = []
+    for i, (method, path, body) in enumerate(requests):
+        payload = json.dumps(body) if body is not None else ""
+        parts.append(
+            f"--{boundary}\r\n"
+            "Content-Type: application/http\r\n"
+            f"Content-ID: <item-{i}>\r\n"
+            "\r\n"
+            f"{method} {api_path}{path} HTTP/1.1\r\n"
+            "Content-Type: application/json\r\n"
+            "\r\n"
+            f"{payload}\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n")
+    return f"multipart/mixed; boundary={boundary}", "".join(parts).encode()
+
+def parse_batch(content_type, content, count):
+    """
+    Parse a multipart/mixed batch response
+    Returns a list of (status_code, json_body) ordered like the original requests,
+    parts missing from the response are reported with status 0
+    """
+    boundary = None
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "boundary":
+            boundary = value.strip('"')
+    if boundary is None:
+        raise ValueError("Batch response is missing a multipart boundary")
+
+    results = [(0, None)] * count
+    text = content.decode() if isinstance(content, bytes) else content
+    for part in text.split(f"--{boundary}"):
+        part = part.strip()
+        if not part or part == "--":
+            continue
+        outer_headers, _, inner = part.replace("\r\n", "\n").partition("\n\n")
+        index = _content_index(outer_headers)
+        status_line, _, rest = inner.partition("\n")
+        _, _, body = rest.partition("\n\n")
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            continue
+        try:
+            body_json = json.loads(body) if body.strip() else None
+        except json.JSONDecodeError:
+            body_json = None
+        if index is not None and 0 <= index < count:
+            results[index] = (status, body_json)
+    return results
+
+def _content_index(headers):
+    for line in headers.split("\n"):
+        key, _, value = line.partition(":")
+        if key.strip().lower() == "content-id":
+            # Responses echo the id as <response-item-N>
+            value = value.strip().strip("<>")
+            try:
+                return int(value.rsplit("-", 1)[1])
+            except (IndexError, ValueError):
+                return None
+    return None
@@ -0,0 +1,51 @@
+from collections import OrderedDict
+import os
+import time
+
+# Seconds a cached calendar list is served before being revalidated with its ETag
+CALENDAR_LIST_TTL = float(os.getenv("CALENDAR_LIST_TTL", "60"))
+MAX_CACHED_USERS = 10000
+
+class CalendarList:
+    __slots__ = ("items", "etag", "fetched_at")
+
+    def __init__(self, items, etag):
+        self.items = items
+        self.etag = etag
+        self.fetched_at = time.monotonic()
+
+    @property
+    def fresh(self):
+        return time.monotonic() - self.fetched_at < CALENDAR_LIST_TTL
+
+class CalendarListCache:
+    """
+    Each user's calendarList with the ETag it was served with, least recently used users evicted first
+    """
+    def __init__(self, max_users=MAX_CACHED_USERS):
+        self.max_users = max_users
+        self._lists = OrderedDict()
+
+    def get(self, user_key):
+        calendar_list = self._lists.get(user_key)
+        if calendar_list is not None:
+            self._lists.move_to_end(user_key)
+        return calendar_list
+
+    def put(self, user_key, items, etag):
+        self._lists[user_key] = CalendarList(items, etag)
+        self._lists.move_to_end(user_key)
+        while len(self._lists) > self.max_users:
+            self._lists.popitem(last=False)
+
+    # Write-through for calendars created, renamed or deleted through the MCP
+    def upsert(self, user_key, item):
+        calendar_list = self._lists.get(user_key)
+        if calendar_list is None:
+            return
+        calendar_list.items = [i for i in calendar_list.items if i["id"] != item["id"]] + [item]
+
+    def remove(self, user_key, calendar_id):
+        calendar_list = self._lists.get(user_key)
+        if calendar_list is not None:
+            calendar_list.items = [i for i in calendar_list.items if i["id"] != calendar_id]
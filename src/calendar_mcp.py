@@ -1,46 +1,247 @@
-from datetime import datetime, timezone
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, time as clock_time, timedelta, timezone
+from itertools import batched
 import os
 import time
+import uuid
 
-from fastmcp import FastMCP
+from fastmcp import Context, FastMCP
 import logging
 import httpx
+from typing import NotRequired, TypedDict
+from urllib.parse import quote
+from zoneinfo import ZoneInfo
 
+from batch import BATCH_API, MAX_BATCH_SIZE, build_batch, parse_batch
+from calendar_list_cache import CalendarListCache
+from event_cache import EventCache
+import ics
+from formatting import CALENDAR_FIELDS, DEFAULT_MAX_CHARS, EVENT_FIELDS, SEARCH_FIELDS, calendar_row, event_row, format_rows, parse_fields
+from ownership import OwnershipIndex, has_owned_marker, mark_owned
+from http_client import create_client
+from metrics import WEBHOOK_NOTIFICATIONS, instrument_tool
+from ratelimit import IDEMPOTENT_METHODS, MAX_RETRIES, RequestScheduler, is_rate_limited
+from recurrence import expand
+from scheduling import find_conflicts, free_slots, merge_intervals, parse_rfc3339
+from search_index import EventIndex, tokenize
+from singleflight import SingleFlight
+from watch import WATCH_CHANNEL_TTL, WATCH_RENEW_CHECK_INTERVAL, WATCH_RENEW_MARGIN, WATCH_SECRET, WEBHOOK_URL, Channel, WatchRegistry
 from oauth import OAuth
 
-CALENDAR_API = "https://www.googleapis.com/calendar/v3"
+logger = logging.getLogger(__name__)
+
+# Overridable to point the MCP at a stand-in server, see bench/fake_google.py
+CALENDAR_API = os.getenv("CALENDAR_API", "https://www.googleapis.com/calendar/v3")
+
+# Events are fetched in pages of this size, projected to the fields list_events prints
+EVENT_PAGE_SIZE = 250
+EVENT_LIST_FIELDS = "nextPageToken,items(id,summary,description,start,end,location,recurrence)"
+CALENDAR_LIST_FIELDS = "etag,nextPageToken,items(id,summary)"
+# Recurring events without an end date are checked for conflicts this far ahead
+CONFLICT_HORIZON = timedelta(days=366)
+# Conflicts and occurrences listed before the output is summarised
+MAX_LISTED_CONFLICTS = 10
+# freeBusy accepts at most this many calendars per request
+FREEBUSY_MAX_CALENDARS = 50
+# Searches reuse calendars synced this many seconds ago without a delta request
+SEARCH_MAX_STALENESS = float(os.getenv("SEARCH_MAX_STALENESS", "30"))
+EVENT_SYNC_FIELDS = "nextPageToken,nextSyncToken,items(id,status,etag,summary,description,start,end,location,recurrence,extendedProperties)"
+EXPORT_FIELDS = "nextPageToken,items(id,iCalUID,status,summary,description,start,end,location,recurrence,recurringEventId,originalStartTime)"
+# export_calendar and import_calendar only read and write .ics files inside this directory
+ICS_DIR = os.getenv("ICS_DIR", "exports")
+# Batch requests import_calendar keeps in flight, each carrying up to MAX_BATCH_SIZE events
+IMPORT_CONCURRENCY = int(os.getenv("IMPORT_CONCURRENCY", "4"))
+MAX_LISTED_IMPORT_FAILURES = 10
+
+class EventSpec(TypedDict):
+    event_name: str
+    time_zone: str
+    start_date_time: str
+    end_date_time: str
+    location: NotRequired[str | None]
+    repeats: NotRequired[bool]
+    repeat_days: NotRequired[str | None]
+    final_repeat_date: NotRequired[str | None]
 
 class CalendarMcp:
     def __init__(self, auth):
         self.auth = auth
         self.mcp = FastMCP("calendar")
+        self._client = None
+        self.event_cache = EventCache()
+        self.ownership = OwnershipIndex()
+        self.scheduler = RequestScheduler()
+        self.calendar_lists = CalendarListCache()
+        self._calendar_list_fetches = SingleFlight()
+        self.watches = WatchRegistry(WATCH_SECRET or auth.CLIENT_SECRET)
 
         self.MCP_DESCRIPTION = "Generated via calendar-mcp"
+        self.receives_notifications = False
 
         self.register_tools()
 
+    # The pooled upstream client shared by every tool call, created on first use to keep startup fast
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = create_client()
+        return self._client
+
+    @asynccontextmanager
+    async def lifespan(self):
+        async with self.auth.lifespan(lambda: self.client):
+            renewals = asyncio.create_task(self._renew_watches())
+            try:
+                yield
+            finally:
+                renewals.cancel()
+                try:
+                    await renewals
+                except asyncio.CancelledError:
+                    pass
+                await self._stop_watches()
+                if self._client is not None:
+                    await self._client.aclose()
+                    self._client = None
+
     # For stdio mode
     def run(self):
-        self.mcp.run(transport="stdio")
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        async with self.lifespan():
+            await self.mcp.run_async(transport="stdio")
 
-    # For http mode
-    def get_asgi_app(self):
-        return self.mcp.http_app(path="/")
+    # For http mode, stateless when requests may land on different worker processes
+    def get_asgi_app(self, stateless=False):
+        # A notification reaches one worker, so no worker can vouch that its own cached copy is current
+        self.watches.trust_clean = not stateless
+        return self.mcp.http_app(path="/", stateless_http=stateless)
 
+    # For http mode, receives Google push notifications for watch_calendar
+    def get_webhook_app(self):
+        from starlette.routing import Route, Router
+        self.receives_notifications = True
+        return Router(routes=[Route("/calendar", endpoint=self.calendar_webhook, methods=["POST"])])
+
+    # Every tool is timed into the tool latency histogram served at /metrics
     def register_tools(self):
-        self.get_url = self.mcp.tool()(self.get_url)
-        self.verify_login = self.mcp.tool()(self.verify_login)
-        self.get_user = self.mcp.tool()(self.get_user)
-        self.list_calendars = self.mcp.tool()(self.list_calendars)
-        self.create_calendar = self.mcp.tool()(self.create_calendar)
-        self.patch_calendar = self.mcp.tool()(self.patch_calendar)
-        self.delete_calendar = self.mcp.tool()(self.delete_calendar)
-        self.list_events = self.mcp.tool()(self.list_events)
-        self.insert_event = self.mcp.tool()(self.insert_event)
-        self.patch_event = self.mcp.tool()(self.patch_event)
-        self.delete_event = self.mcp.tool()(self.delete_event)
-
-    def get_url(self) -> str:
+        self.get_url = self.mcp.tool()(instrument_tool(self.get_url))
+        self.verify_login = self.mcp.tool()(instrument_tool(self.verify_login))
+        self.get_user = self.mcp.tool()(instrument_tool(self.get_user))
+        self.list_calendars = self.mcp.tool()(instrument_tool(self.list_calendars))
+        self.create_calendar = self.mcp.tool()(instrument_tool(self.create_calendar))
+        self.patch_calendar = self.mcp.tool()(instrument_tool(self.patch_calendar))
+        self.delete_calendar = self.mcp.tool()(instrument_tool(self.delete_calendar))
+        self.list_events = self.mcp.tool()(instrument_tool(self.list_events))
+        self.insert_event = self.mcp.tool()(instrument_tool(self.insert_event))
+        self.insert_events = self.mcp.tool()(instrument_tool(self.insert_events))
+        self.patch_event = self.mcp.tool()(instrument_tool(self.patch_event))
+        self.delete_event = self.mcp.tool()(instrument_tool(self.delete_event))
+        self.find_free_slots = self.mcp.tool()(instrument_tool(self.find_free_slots))
+        self.search_events = self.mcp.tool()(instrument_tool(self.search_events))
+        self.watch_calendar = self.mcp.tool()(instrument_tool(self.watch_calendar))
+        self.export_calendar = self.mcp.tool()(instrument_tool(self.export_calendar))
+        self.import_calendar = self.mcp.tool()(instrument_tool(self.import_calendar))
+        self.preview_event = self.mcp.tool()(instrument_tool(self.preview_event))
+
+    # Every Google API call goes through the scheduler for rate limiting and retries
+    # cost is the number of quota units the call uses, idempotent defaults to the HTTP method's semantics
+    # background requests do not count as use of the session, so they never keep an idle session alive
+    async def _request(
+        self,
+        method: str,
+        session_id: str,
+        path: str,
+        base_url: str = CALENDAR_API,
+        idempotent: bool | None = None,
+        cost: int = 1,
+        background: bool = False,
+        **kwargs,
+    ) -> httpx.Response:
+        headers = kwargs.pop("headers", {})
+
+        async def send():
+            headers["Authorization"] = f"Bearer {await self.auth.get_access_token(session_id, touch=not background)}"
+            return await self.client.request(method, f"{base_url}{path}", headers=headers, **kwargs)
+
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        return await self.scheduler.send(self._user_key(session_id), session_id, send, idempotent, cost)
+
+    def _is_mcp_calendar(self, calendar):
+        return calendar.get("description") == self.MCP_DESCRIPTION
+
+    # Events created before the extended property marker existed only carry the description
+    def _is_mcp_event(self, event):
+        return has_owned_marker(event) or event.get("description") == self.MCP_DESCRIPTION
+
+    # Sends an If-Match mutation for a resource in the ownership index, verifying ownership with a GET
+    # only when the ETag is unknown or stale. Returns None if the resource was not generated by the MCP
+    async def _owned_request(self, method, session_id, path, key, is_owned, **kwargs):
+        etag = self.ownership.get(key)
+        for _ in range(2):
+            if etag is None:
+                res = await self._request("GET", session_id, path)
+                res.raise_for_status()
+                if not is_owned(res.json()):
+                    return None
+                etag = res.json()["etag"]
+                self.ownership.put(key, etag)
+            res = await self._request(method, session_id, path, headers={"If-Match": etag}, **kwargs)
+            if res.status_code != 412:
+                break
+            self.ownership.discard(key)
+            etag = None
+        res.raise_for_status()
+        if method == "DELETE":
+            self.ownership.discard(key)
+        else:
+            self.ownership.put(key, res.json().get("etag"))
+        return res
+
+    def _user_key(self, session_id):
+        session = self.auth.sessions.peek(session_id)
+        return session.sub if session is not None else session_id
+
+    def _weekly_recurrence(self, repeat_days, final_repeat_date):
+        final_dt = datetime.strptime(final_repeat_date, "%Y-%m-%dT%H:%M:%S")
+        final_dt = final_dt.replace(tzinfo=timezone.utc)
+        final_dt_reformatted = final_dt.strftime("%Y%m%dT%H%M%SZ")
+        return [
+            f"RRULE:FREQ=WEEKLY;UNTIL={final_dt_reformatted};WKST=SU;BYDAY={repeat_days}"
+        ]
+
+    def _event_json(
+        self,
+        event_name,
+        time_zone,
+        start_date_time,
+        end_date_time,
+        location=None,
+        repeats=False,
+        repeat_days=None,
+        final_repeat_date=None,
+    ):
+        input_json = {
+            "start": {
+                "dateTime": start_date_time,
+                "timeZone": time_zone,
+            },
+            "end": {
+                "dateTime": end_date_time,
+                "timeZone": time_zone,
+            },
+            "description": self.MCP_DESCRIPTION,
+            "summary": event_name,
+        }
+        if location: input_json["location"] = location
+        if repeats:
+            input_json["recurrence"] = self._weekly_recurrence(repeat_days, final_repeat_date)
+        return mark_owned(input_json)
+
+    async def get_url(self) -> str:
         """
             Purpose: Get an OAuth URL and session ID to log in to Google Calendar.
             Usage: Triggered when the user requests login (e.g., "log me into calendar") or runs a command that requires a login.
@@ -51,13 +252,14 @@ class CalendarMcp:
             </message>
             Do not verify login after, this tool is terminal.
         """
+        await self.auth.ensure_callback_server()
         url, session_id = self.auth.get_url_and_session()
         return f"""
             URL: {url}
             session_id: {session_id}
         """
 
-    def verify_login(self, session_id: str) -> str:
+    async def verify_login(self, session_id: str) -> str:
         """
         Verify whether the user has successfully logged in with the url provided.
         Log in only needs to be verified once.
@@ -67,7 +269,7 @@ class CalendarMcp:
         """
         return f"Logged in: {session_id in self.auth.sessions}"
 
-    def get_user(self, session_id: str) -> str:
+    async def get_user(self, session_id: str) -> str:
         """
         Get user information
         This assumes that OAuth url has been received and user has gone through with authentication
@@ -75,52 +277,85 @@ class CalendarMcp:
         Args:
             session_id: Session id obtained from get_url
         """
-        if session_id not in self.auth.sessions:
+        session = self.auth.sessions.get(session_id)
+        if session is None:
             return "User has not logged in yet"
-        session_data = self.auth.sessions[session_id]
         return f"""
-            email: {session_data["email"]}
-            name: {session_data["name"]}
-            id: {session_data["sub"]}
+            email: {session.email}
+            name: {session.name}
+            id: {session.sub}
         """
 
-    def list_calendars(self, session_id: str) -> str:
+    async def list_calendars(
+        self,
+        session_id: str,
+        output_format: str = "text",
+        max_chars: int = DEFAULT_MAX_CHARS,
+    ) -> str:
         """
         List calendars, assumes user has gone through with authentication.
         Use if a given calendar_id is unknown.
         Args:
             session_id: Session id obtained from get_url
+            output_format: text, table (tab separated with a header row) or jsonl (optional default text)
+            max_chars: Output is cut off with a truncation marker past this many characters (optional)
         """
-        with httpx.Client() as client:
-            res = client.get(
-                f"{CALENDAR_API}/users/me/calendarList", 
-                headers={"Authorization": f"Bearer {self.auth.get_access_token(session_id)}"},
-            )
+        items = await self._calendar_list(session_id)
+        return format_rows(
+            (calendar_row(item) for item in items), list(CALENDAR_FIELDS), output_format, max_chars,
+            # jsonl and table output must stay machine readable from the first line
+            header="Calendars:" if output_format == "text" else None,
+        )
+
+    # Served from cache while fresh, then revalidated with If-None-Match
+    # Concurrent lookups for the same user share one upstream fetch
+    async def _calendar_list(self, session_id):
+        user_key = self._user_key(session_id)
+        cached = self.calendar_lists.get(user_key)
+        if cached is not None and cached.fresh:
+            return cached.items
+        return await self._calendar_list_fetches.do(user_key, lambda: self._fetch_calendar_list(session_id, user_key, cached))
+
+    async def _fetch_calendar_list(self, session_id, user_key, cached):
+        params = {"fields": CALENDAR_LIST_FIELDS}
+        headers = {"If-None-Match": cached.etag} if cached is not None and cached.etag else {}
+        items = []
+        etag = None
+        while True:
+            res = await self._request("GET", session_id, "/users/me/calendarList", params=params, headers=headers)
+            if res.status_code == 304:
+                self.calendar_lists.put(user_key, cached.items, cached.etag)
+                return cached.items
             res.raise_for_status()
-            res_json = res.json()
-        output_str = "Calendars:\n"
-        for item in res_json["items"]:
-            output_str += f"Name: {item["summary"]}\nId: {item["id"]}\n\n"
-        return output_str
+            page = res.json()
+            # The collection ETag is the first page's
+            etag = etag or page.get("etag") or res.headers.get("ETag")
+            items.extend(page.get("items", []))
+            if "nextPageToken" not in page:
+                break
+            params = {**params, "pageToken": page["nextPageToken"]}
+            headers = {}
+        self.calendar_lists.put(user_key, items, etag)
+        return items
 
-    def create_calendar(self, session_id: str, calendar_name: str) -> str:
+    async def create_calendar(self, session_id: str, calendar_name: str) -> str:
         """
         Creates a new calendar, assumes user has gone through with authentication
         Args:
             session_id: Session id obtained from get_url
             calendar_name: Name of new calendar (ask for this if user does not provide)
         """
-        with httpx.Client() as client:
-            res = client.post(
-                f"{CALENDAR_API}/calendars",
-                headers={"Authorization": f"Bearer {self.auth.get_access_token(session_id)}"},
-                json={"summary": calendar_name, "description": self.MCP_DESCRIPTION},
-            )
-            res.raise_for_status()
-            calendar_id = res.json()["id"]
+        res = await self._request(
+            "POST", session_id, "/calendars",
+            json={"summary": calendar_name, "description": self.MCP_DESCRIPTION},
+        )
+        res.raise_for_status()
+        calendar_id = res.json()["id"]
+        self.ownership.put((self._user_key(session_id), calendar_id), res.json().get("etag"))
+        self.calendar_lists.upsert(self._user_key(session_id), {"id": calendar_id, "summary": calendar_name})
         return f"calendar_id: {calendar_id}"
 
-    def patch_calendar(self, session_id: str, calendar_id: str, new_calendar_name: str) -> str:
+    async def patch_calendar(self, session_id: str, calendar_id: str, new_calendar_name: str) -> str:
         """
         Patches an exissting calendar, assumes user has gone through authentication
         Args:
@@ -128,28 +363,21 @@ class CalendarMcp:
             calendar_id: Id of calendar either form create_calendar or list_calendars
             new_calenar_name: New calendar name
         """
-        with httpx.Client() as client:
-            res = client.get(
-                f"{CALENDAR_API}/calendars/{calendar_id}",
-                headers={"Authorization": f"Bearer {self.auth.get_access_token(session_id)}"},
-            )
-            res.raise_for_status()
-            if res.json()["description"] != self.MCP_DESCRIPTION:
-                return f"Failed to delete: calendar_id {calendar_id} was not generated by MCP"
-
-            res = client.patch(
-                f"{CALENDAR_API}/calendars/{calendar_id}",
-                headers={"Authorization": f"Bearer {self.auth.get_access_token(session_id)}"},
-                json={"summary": new_calendar_name}
-            )
-            res.raise_for_status()
+        res = await self._owned_request(
+            "PATCH", session_id, f"/calendars/{calendar_id}",
+            (self._user_key(session_id), calendar_id), self._is_mcp_calendar,
+            json={"summary": new_calendar_name},
+        )
+        if res is None:
+            return f"Failed to patch: calendar_id {calendar_id} was not generated by MCP"
+        self.calendar_lists.upsert(self._user_key(session_id), {"id": calendar_id, "summary": new_calendar_name})
         return f"""
             Successfully patched calendar
             calendar_id: {calendar_id}
         """
 
 
-    def delete_calendar(self, session_id: str, calendar_id: str) -> str:
+    async def delete_calendar(self, session_id: str, calendar_id: str) -> str:
         """
         Deletes a calendar, calendar must have been created by calendar mcp either in current or previous session.
         Assumes user has gone through authentication
@@ -157,51 +385,137 @@ class CalendarMcp:
             session_id: Session id obtained from get_url
             calendar_id: Id of calendar either from create_calendar or list_calendars
         """
-        with httpx.Client() as client:
-            res = client.get(
-                f"{CALENDAR_API}/calendars/{calendar_id}",
-                headers={"Authorization": f"Bearer {self.auth.get_access_token(session_id)}"},
-            )
-            res.raise_for_status()
-            if res.json()["description"] != self.MCP_DESCRIPTION:
-                return f"Failed to delete: calendar_id {calendar_id} was not generated by MCP"
+        res = await self._owned_request(
+            "DELETE", session_id, f"/calendars/{calendar_id}",
+            (self._user_key(session_id), calendar_id), self._is_mcp_calendar,
+        )
+        if res is None:
+            return f"Failed to delete: calendar_id {calendar_id} was not generated by MCP"
+        self.event_cache.invalidate((self._user_key(session_id), calendar_id))
+        self.calendar_lists.remove(self._user_key(session_id), calendar_id)
+        return f"calendar_id: {calendar_id}"""
 
-            res = client.delete(
-                f"{CALENDAR_API}/calendars/{calendar_id}",
-                headers={"Authorization": f"Bearer {self.auth.get_access_token(session_id)}"},
-            )
+    async def _iter_pages(self, session_id, calendar_id, params=None):
+        params = {"fields": EVENT_LIST_FIELDS, "maxResults": EVENT_PAGE_SIZE, **(params or {})}
+        while True:
+            res = await self._request("GET", session_id, f"/calendars/{calendar_id}/events", params=params)
             res.raise_for_status()
-        return f"calendar_id: {calendar_id}"""
+            page = res.json()
+            yield page
+            if "nextPageToken" not in page:
+                return
+            params["pageToken"] = page["nextPageToken"]
+
+    async def _iter_events(self, session_id, calendar_id, params=None):
+        async for page in self._iter_pages(session_id, calendar_id, params):
+            for event in page.get("items", []):
+                yield event
 
-    def list_events(self, session_id: str, calendar_id: str):
+    # Brings the cached copy of a calendar up to date, a full listing the first time and a syncToken delta after
+    # A copy synced less than max_age seconds ago, or of a watched calendar with no change notified since, is served without asking Google
+    async def _sync_events(self, session_id, calendar_id, max_age=0):
+        key = (self._user_key(session_id), calendar_id)
+        entry = self.event_cache.get(key)
+        if entry is not None and (time.monotonic() - entry.synced_at < max_age or self.watches.is_clean(key)):
+            return list(entry.events.values())
+        generation = self.watches.generation(key)
+        if entry is not None:
+            changes = []
+            try:
+                async for page in self._iter_pages(session_id, calendar_id, {"fields": EVENT_SYNC_FIELDS, "syncToken": entry.sync_token}):
+                    changes.extend(page.get("items", []))
+                    sync_token = page.get("nextSyncToken")
+            except httpx.HTTPStatusError as e:
+                # 410 Gone means the sync token expired, start over with a full sync
+                if e.response.status_code != 410:
+                    raise
+                self.event_cache.invalidate(key)
+            else:
+                self.event_cache.apply(key, changes, sync_token)
+                self._index_owned_events(key, changes)
+                self.watches.mark_synced(key, generation)
+                return list(entry.events.values())
+
+        events = []
+        async for page in self._iter_pages(session_id, calendar_id, {"fields": EVENT_SYNC_FIELDS}):
+            events.extend(event for event in page.get("items", []) if event.get("status") != "cancelled")
+            sync_token = page.get("nextSyncToken")
+        self.event_cache.put(key, events, sync_token)
+        self._index_owned_events(key, events)
+        self.watches.mark_synced(key, generation)
+        return events
+
+    def _index_owned_events(self, key, events):
+        for event in events:
+            if event.get("status") == "cancelled":
+                self.ownership.discard((*key, event["id"]))
+            elif has_owned_marker(event):
+                self.ownership.put((*key, event["id"]), event.get("etag"))
+
+    def _to_rfc3339(self, date_time, time_zone):
+        dt = datetime.strptime(date_time, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=ZoneInfo(time_zone))
+        return dt.isoformat()
+
+    async def list_events(
+        self,
+        session_id: str,
+        calendar_id: str,
+        time_min: str | None = None,
+        time_max: str | None = None,
+        time_zone: str = "UTC",
+        max_results: int | None = None,
+        output_format: str = "text",
+        fields: str | None = None,
+        max_chars: int = DEFAULT_MAX_CHARS,
+    ) -> str:
         """
         Lists the events on a calendar, good for verifying if events were all inserted correctly.
+        Narrow the window with time_min/time_max when only part of the calendar is needed.
+        All datetime arguments are formatted as such YYYY-MM-DDTHH:MM:SS (do not include Z at the end)
         Assumes user has gone through authentication.
         Args:
             session_id: Session id obtained from get_url
             calendar_id: Id of calendar either from create_calendar or list_calendars
+            time_min: Only list events ending after this time (optional)
+            time_max: Only list events starting before this time (optional)
+            time_zone: IANA time zone that time_min and time_max are given in (optional default UTC)
+            max_results: Maximum number of events to list (optional default all)
+            output_format: text, table (tab separated with a header row) or jsonl, table and jsonl are the most compact (optional default text)
+            fields: Comma separated subset of event_id,name,description,start,end,location,recurrence to show (optional default all)
+            max_chars: Output is cut off with a truncation marker past this many characters (optional)
         """
-        with httpx.Client() as client:
-            res = client.get(
-                f"{CALENDAR_API}/calendars/{calendar_id}/events",
-                headers={"Authorization": f"Bearer {self.auth.get_access_token(session_id)}"},
-            )
-            res.raise_for_status()
-            events_list = res.json()["items"]
-        output_str = ""
-        for event in events_list:
-            output_str += f"""
-                event_id: {event["id"]}
-                name: {event.get("summary", "n/a")}
-                description: {event.get("description", "n/a")}
-                start: {event["start"]["dateTime"]} {event["start"]["timeZone"]}
-                end: {event["end"]["dateTime"]} {event["end"]["timeZone"]}
-                location: {event.get("location", "n/a")}
-                repition/recurrence_rules: {" ".join(event.get("recurrence", []))}
-            """
-        return output_str
-
-    def insert_event(
+        selected_fields = parse_fields(fields, EVENT_FIELDS)
+        key = (self._user_key(session_id), calendar_id)
+        if (time_min or time_max) and key in self.watches.channels:
+            # Watched calendars are kept synced, so windows are cut from the cache rather than listed again
+            window_start = datetime.fromisoformat(self._to_rfc3339(time_min, time_zone)) if time_min else None
+            window_end = datetime.fromisoformat(self._to_rfc3339(time_max, time_zone)) if time_max else None
+            events = await self._sync_events(session_id, calendar_id)
+            entry = self.event_cache.get(key)
+            if entry is not None:
+                index, by_id = entry.search_index(), entry.events
+            else:
+                index, by_id = EventIndex(events), {event["id"]: event for event in events}
+            matches = sorted(index.search(set(), window_start, window_end))
+            events_list = [by_id[event_id] for _, event_id in matches[:max_results or None]]
+        elif time_min or time_max:
+            params = {}
+            if time_min: params["timeMin"] = self._to_rfc3339(time_min, time_zone)
+            if time_max: params["timeMax"] = self._to_rfc3339(time_max, time_zone)
+            if max_results: params["maxResults"] = min(max_results, EVENT_PAGE_SIZE)
+            events_list = []
+            async for event in self._iter_events(session_id, calendar_id, params):
+                events_list.append(event)
+                if max_results and len(events_list) >= max_results:
+                    break
+        else:
+            # Unwindowed listings are served from the synced cache
+            events_list = await self._sync_events(session_id, calendar_id)
+            if max_results:
+                events_list = events_list[:max_results]
+        return format_rows((event_row(event) for event in events_list), selected_fields, output_format, max_chars)
+
+    async def insert_event(
         self,
         session_id: str,
         calendar_id: str,
@@ -213,6 +527,7 @@ class CalendarMcp:
         repeats: bool = False,
         repeat_days: str | None = None,
         final_repeat_date: str | None = None,
+        check_conflicts: bool = False,
     ) -> str:
         """
         Inserts a new calendar event, assumes user has gone through with authentication
@@ -227,45 +542,113 @@ class CalendarMcp:
             start_date_time: The start time of the event, the start of the first event if the event repeats
             end_date_time: The end time of the event, the end of the first event if the event repeats
             location: The location of the event (optional)
-            repeats: Whether the event repeats or not (optional default False) 
+            repeats: Whether the event repeats or not (optional default False)
             repeat_days: A string containing the days that the event repeats weekly comma separated (i.e. TU,TH) (optional)
             final_repeat_date: A datetime string indicating the cutoff date for repetitions, it does not need to fall on an event occurrence. (ask user if unknown) If time is unknown just use midnight (optional)
+            check_conflicts: Do not insert if any occurrence overlaps an existing event on the calendar, the conflicts are returned instead (optional default False)
         """
-        input_json = {
-            "start": {
-                "dateTime": start_date_time,
-                "timeZone": time_zone,
-            },
-            "end": {
-                "dateTime": end_date_time,
-                "timeZone": time_zone,
-            },
-            "description": self.MCP_DESCRIPTION,
-            "summary": event_name,
-        }
-        if location: input_json["location"] = location
-        if repeats:
-            final_dt = datetime.strptime(final_repeat_date, "%Y-%m-%dT%H:%M:%S")
-            final_dt = final_dt.replace(tzinfo=timezone.utc)
-            final_dt_reformatted = final_dt.strftime("%Y%m%dT%H%M%SZ")
-            input_json["recurrence"] = [
-                f"RRULE:FREQ=WEEKLY;UNTIL={final_dt_reformatted};WKST=SU;BYDAY={repeat_days}"
-            ]
-
-        with httpx.Client() as client:
-            res = client.post(
-                f"{CALENDAR_API}/calendars/{calendar_id}/events",
-                headers={"Authorization": f"Bearer {self.auth.get_access_token(session_id)}"},
-                json=input_json,
-            )
-            res.raise_for_status()
-            event_id = res.json()["id"]
+        input_json = self._event_json(
+            event_name, time_zone, start_date_time, end_date_time,
+            location, repeats, repeat_days, final_repeat_date,
+        )
+        if check_conflicts:
+            occurrences = self._occurrences(time_zone, start_date_time, end_date_time, input_json.get("recurrence"))
+            conflicts, errors = await self._find_conflicts(session_id, calendar_id, occurrences)
+            if errors:
+                return f"Could not check conflicts: {", ".join(errors)}\nEvent was not inserted, call again with check_conflicts false to insert anyway"
+            if conflicts:
+                return self._conflict_report(conflicts, time_zone, "Event was not inserted, call again with check_conflicts false to insert anyway")
+        res = await self._request("POST", session_id, f"/calendars/{calendar_id}/events", json=input_json)
+        res.raise_for_status()
+        event_id = res.json()["id"]
+        self.event_cache.upsert_event((self._user_key(session_id), calendar_id), res.json())
+        self.ownership.put((self._user_key(session_id), calendar_id, event_id), res.json().get("etag"))
         return f"""
             event_name: {event_name}
             event_id: {event_id}
         """
 
-    def patch_event(
+    async def insert_events(self, session_id: str, calendar_id: str, events: list[EventSpec]) -> str:
+        """
+        Inserts many calendar events at once, prefer this over repeated insert_event calls (e.g. loading a full schedule)
+        Each event takes the same fields as insert_event: event_name, time_zone, start_date_time, end_date_time,
+        and optionally location, repeats, repeat_days, final_repeat_date
+        All datetime arguments are formatted as such YYYY-MM-DDTHH:MM:SS (do not include Z at the end)
+        Weekday abbreviations are according to RFC: SU, MO, TU, WE, TH, FR, SA
+        Assumes user has gone through authentication
+        Args:
+            session_id: Session id obtained from get_url
+            calendar_id: The id of calendar the events should be added to, is returned from create_calendar
+            events: List of events to insert
+        """
+        results = [None] * len(events)
+        pending = []
+        for i, spec in enumerate(events):
+            try:
+                input_json = self._event_json(
+                    spec["event_name"], spec["time_zone"], spec["start_date_time"], spec["end_date_time"],
+                    spec.get("location"), spec.get("repeats", False), spec.get("repeat_days"), spec.get("final_repeat_date"),
+                )
+            except (KeyError, TypeError, ValueError) as e:
+                results[i] = f"failed: invalid event ({e})"
+                continue
+            pending.append((i, input_json))
+
+        # A chunk that fails outright only fails its own events, the others are still reported
+        async def send_chunk(chunk):
+            try:
+                inserted = await self._batch_insert(session_id, calendar_id, [input_json for _, input_json in chunk])
+            except httpx.HTTPStatusError as e:
+                inserted = [f"failed: batch request returned {e.response.status_code}"] * len(chunk)
+            except (httpx.HTTPError, ValueError) as e:
+                inserted = [f"failed: {e!r}"] * len(chunk)
+            for (i, _), result in zip(chunk, inserted):
+                results[i] = result
+
+        await asyncio.gather(*(send_chunk(chunk) for chunk in batched(pending, MAX_BATCH_SIZE)))
+
+        succeeded = sum(1 for r in results if r.startswith("event_id"))
+        lines = [f"Inserted {succeeded}/{len(events)} events"]
+        for spec, result in zip(events, results):
+            lines.append(f"{spec.get("event_name", "n/a")}: {result}")
+        return "\n".join(lines)
+
+    # Inserts up to MAX_BATCH_SIZE events in one batch request, returns "event_id: ..." or "failed ..." for each
+    # Parts throttled by Google are resent on their own, after the scheduler has backed the user off
+    # Raises httpx.HTTPStatusError when the batch request as a whole fails, which the scheduler has not retried away
+    async def _batch_insert(self, session_id, calendar_id, input_jsons):
+        results = [None] * len(input_jsons)
+        pending = list(range(len(input_jsons)))
+        attempt = 0
+        while pending:
+            content_type, body = build_batch(
+                [("POST", f"/calendars/{quote(calendar_id, safe="@")}/events", input_jsons[i]) for i in pending],
+                CALENDAR_API,
+            )
+            res = await self._request(
+                "POST", session_id, "", base_url=BATCH_API, cost=len(pending),
+                headers={"Content-Type": content_type},
+                content=body,
+            )
+            res.raise_for_status()
+            throttled = []
+            for i, (status, body_json) in zip(pending, parse_batch(res.headers.get("content-type", ""), res.content, len(pending))):
+                if 200 <= status < 300 and body_json:
+                    results[i] = f"event_id: {body_json["id"]}"
+                    self.event_cache.upsert_event((self._user_key(session_id), calendar_id), body_json)
+                    self.ownership.put((self._user_key(session_id), calendar_id, body_json["id"]), body_json.get("etag"))
+                elif is_rate_limited(status, body_json) and attempt < MAX_RETRIES:
+                    throttled.append(i)
+                else:
+                    message = (body_json or {}).get("error", {}).get("message", "no response")
+                    results[i] = f"failed ({status}): {message}"
+            if throttled:
+                self.scheduler.pause_user(self._user_key(session_id), attempt)
+                attempt += 1
+            pending = throttled
+        return results
+
+    async def patch_event(
         self,
         session_id: str,
         calendar_id: str,
@@ -278,6 +661,7 @@ class CalendarMcp:
         repeats: bool = False,
         repeat_days: str | None = None,
         final_repeat_date: str | None = None,
+        check_conflicts: bool = False,
     ) -> str:
         """
         Patches an event with updated information
@@ -296,15 +680,8 @@ class CalendarMcp:
             repeats: Whether the event repeats or not (optional default False)
             repeat_days: A string containing the days that the event repeats weekly comma separated (i.e. TU,TH) (optional)
             final_repeat_date: A datetime string indicating the cutoff date for repetitions, it does not need to fall on an event occurrence. (ask user if unknown) If time is unknown just use midnight (optional)
+            check_conflicts: Do not patch if the new times overlap another event on the calendar, needs new_start_date_time and new_end_date_time (optional default False)
         """
-        with httpx.Client() as client:
-            res = client.get(
-                f"{CALENDAR_API}/calendars/{calendar_id}/events/{event_id}",
-                headers={"Authorization": f"Bearer {self.auth.get_access_token(session_id)}"},
-            )
-            if res.json().get("description", "") != self.MCP_DESCRIPTION:
-                return "Cannot patch an event which is not MCP generated"
-
         input_json = {}
         if new_event_name:
             input_json["summary"] = new_event_name
@@ -322,27 +699,32 @@ class CalendarMcp:
             }
         if new_location: input_json["location"] = new_location
         if repeats:
-            final_dt = datetime.strptime(final_repeat_date, "%Y-%m-%dT%H:%M:%S")
-            final_dt = final_dt.replace(tzinfo=timezone.utc)
-            final_dt_reformatted = final_dt.strftime("%Y%m%dT%H%M%SZ")
-            input_json["recurrence"] = [
-                f"RRULE:FREQ=WEEKLY;UNTIL={final_dt_reformatted};WKST=SU;BYDAY={repeat_days}"
-            ]
-
-        with httpx.Client() as client:
-            res = client.patch(
-                f"{CALENDAR_API}/calendars/{calendar_id}/events/{event_id}",
-                headers={"Authorization": f"Bearer {self.auth.get_access_token(session_id)}"},
-                json=input_json,
-            )
-            res.raise_for_status()
-            event_id = res.json()["id"]
+            input_json["recurrence"] = self._weekly_recurrence(repeat_days, final_repeat_date)
+        if check_conflicts:
+            if not (new_start_date_time and new_end_date_time):
+                return "check_conflicts needs both new_start_date_time and new_end_date_time"
+            occurrences = self._occurrences(new_time_zone, new_start_date_time, new_end_date_time, input_json.get("recurrence"))
+            conflicts, errors = await self._find_conflicts(session_id, calendar_id, occurrences, exclude_event_id=event_id)
+            if errors:
+                return f"Could not check conflicts: {", ".join(errors)}\nEvent was not patched, call again with check_conflicts false to patch anyway"
+            if conflicts:
+                return self._conflict_report(conflicts, new_time_zone, "Event was not patched, call again with check_conflicts false to patch anyway")
+
+        res = await self._owned_request(
+            "PATCH", session_id, f"/calendars/{calendar_id}/events/{event_id}",
+            (self._user_key(session_id), calendar_id, event_id), self._is_mcp_event,
+            json=input_json,
+        )
+        if res is None:
+            return "Cannot patch an event which is not MCP generated"
+        event_id = res.json()["id"]
+        self.event_cache.upsert_event((self._user_key(session_id), calendar_id), res.json())
         return f"""
             Successfully updated!
             event_id: {event_id}
         """
 
-    def delete_event(
+    async def delete_event(
         self,
         session_id: str,
         calendar_id: str,
@@ -355,19 +737,489 @@ class CalendarMcp:
             calendar_id: The id of calendar the event should be added to, is returned from create_calendar
             event_id: From list_events
         """
-        with httpx.Client() as client:
-            res = client.get(
-                f"{CALENDAR_API}/calendars/{calendar_id}/events/{event_id}",
-                headers={"Authorization": f"Bearer {self.auth.get_access_token(session_id)}"},
-            )
+        res = await self._owned_request(
+            "DELETE", session_id, f"/calendars/{calendar_id}/events/{event_id}",
+            (self._user_key(session_id), calendar_id, event_id), self._is_mcp_event,
+        )
+        if res is None:
+            return "Cannot delete an event which is not MCP generated"
+        self.event_cache.remove_event((self._user_key(session_id), calendar_id), event_id)
+        return "Successfully deleted!"
+
+    # Busy intervals across calendars from freeBusy, one request per FREEBUSY_MAX_CALENDARS sent concurrently
+    async def _fetch_busy(self, session_id, calendar_ids, time_min, time_max):
+        async def query(chunk):
+            res = await self._request("POST", session_id, "/freeBusy", idempotent=True, cost=len(chunk), json={
+                "timeMin": time_min.isoformat(),
+                "timeMax": time_max.isoformat(),
+                "items": [{"id": calendar_id} for calendar_id in chunk],
+            })
             res.raise_for_status()
-            if res.json().get("description") != self.MCP_DESCRIPTION:
-                return "Cannot delete an event which is not MCP generated"
+            return res.json().get("calendars", {})
 
-        with httpx.Client() as client:
-            res = client.delete(
-                f"{CALENDAR_API}/calendars/{calendar_id}/events/{event_id}",
-                headers={"Authorization": f"Bearer {self.auth.get_access_token(session_id)}"},
-            )
+        responses = await asyncio.gather(*(query(chunk) for chunk in batched(calendar_ids, FREEBUSY_MAX_CALENDARS)))
+        busy = []
+        errors = []
+        for calendars in responses:
+            for calendar_id, result in calendars.items():
+                if result.get("errors"):
+                    errors.append(f"{calendar_id} ({result["errors"][0].get("reason", "error")})")
+                busy.extend((parse_rfc3339(b["start"]), parse_rfc3339(b["end"])) for b in result.get("busy", []))
+        return merge_intervals(busy), errors
+
+    async def find_free_slots(
+        self,
+        session_id: str,
+        calendar_ids: list[str],
+        time_min: str,
+        time_max: str,
+        duration_minutes: int,
+        time_zone: str = "UTC",
+        work_start: str = "09:00",
+        work_end: str = "17:00",
+        work_days: str = "MO,TU,WE,TH,FR",
+        max_results: int = 5,
+    ) -> str:
+        """
+        Finds the earliest open time slots shared by all the given calendars, use this instead of listing events when scheduling
+        All datetime arguments are formatted as such YYYY-MM-DDTHH:MM:SS (do not include Z at the end)
+        Weekday abbreviations are according to RFC: SU, MO, TU, WE, TH, FR, SA
+        Assumes user has gone through authentication
+        Args:
+            session_id: Session id obtained from get_url
+            calendar_ids: Ids of every calendar that must be free, from list_calendars (use "primary" for the main calendar)
+            time_min: Start of the search window
+            time_max: End of the search window
+            duration_minutes: Length of the slot needed in minutes
+            time_zone: IANA time zone for the window, working hours and results, such as America/New_York (optional default UTC)
+            work_start: Earliest time of day a slot may start, HH:MM (optional default 09:00)
+            work_end: Latest time of day a slot may end, HH:MM (optional default 17:00)
+            work_days: Comma separated weekdays slots may fall on (optional default MO,TU,WE,TH,FR)
+            max_results: Number of slots to return (optional default 5)
+        """
+        tz = ZoneInfo(time_zone)
+        window_start = datetime.fromisoformat(self._to_rfc3339(time_min, time_zone))
+        window_end = datetime.fromisoformat(self._to_rfc3339(time_max, time_zone))
+        busy, errors = await self._fetch_busy(session_id, calendar_ids, window_start, window_end)
+
+        slots = free_slots(
+            busy, window_start, window_end, timedelta(minutes=duration_minutes), tz,
+            clock_time.fromisoformat(work_start), clock_time.fromisoformat(work_end),
+            {day.strip().upper() for day in work_days.split(",")}, max_results,
+        )
+        lines = [f"Free {duration_minutes} minute slots ({time_zone}):"]
+        for start, gap_end in slots:
+            end = start + timedelta(minutes=duration_minutes)
+            lines.append(f"{start:%Y-%m-%d %a %H:%M}-{end:%H:%M} (free until {gap_end:%H:%M})")
+        if len(lines) == 1:
+            lines.append("none found")
+        if errors:
+            lines.append(f"Could not read: {", ".join(errors)}")
+        return "\n".join(lines)
+
+    async def search_events(
+        self,
+        session_id: str,
+        query: str = "",
+        calendar_ids: list[str] | None = None,
+        time_min: str | None = None,
+        time_max: str | None = None,
+        time_zone: str = "UTC",
+        max_results: int = 25,
+        output_format: str = "text",
+        fields: str | None = None,
+        max_chars: int = DEFAULT_MAX_CHARS,
+    ) -> str:
+        """
+        Searches event names, descriptions and locations across calendars, use this to find an event instead of listing every calendar
+        Matches events containing every word of query (case insensitive), results are sorted by start time
+        All datetime arguments are formatted as such YYYY-MM-DDTHH:MM:SS (do not include Z at the end)
+        Assumes user has gone through authentication
+        Args:
+            session_id: Session id obtained from get_url
+            query: Words to look for, such as "dentist" (optional, empty lists every event in the time range)
+            calendar_ids: Ids of calendars to search from list_calendars (optional default all calendars)
+            time_min: Only match events ending after this time (optional)
+            time_max: Only match events starting before this time (optional)
+            time_zone: IANA time zone that time_min and time_max are given in (optional default UTC)
+            max_results: Maximum number of events to return (optional default 25)
+            output_format: text, table (tab separated with a header row) or jsonl (optional default text)
+            fields: Comma separated subset of calendar_id,event_id,name,description,start,end,location,recurrence to show (optional default all)
+            max_chars: Output is cut off with a truncation marker past this many characters (optional)
+        """
+        selected_fields = parse_fields(fields, SEARCH_FIELDS)
+        window_start = datetime.fromisoformat(self._to_rfc3339(time_min, time_zone)) if time_min else None
+        window_end = datetime.fromisoformat(self._to_rfc3339(time_max, time_zone)) if time_max else None
+        if calendar_ids is None:
+            calendar_ids = [item["id"] for item in await self._calendar_list(session_id)]
+
+        # Calendars are synced concurrently, the scheduler bounds how many requests the session has in flight
+        synced = await asyncio.gather(
+            *(self._sync_events(session_id, calendar_id, max_age=SEARCH_MAX_STALENESS) for calendar_id in calendar_ids),
+            return_exceptions=True,
+        )
+        terms = tokenize(query)
+        matches = []
+        failed = []
+        for calendar_id, events in zip(calendar_ids, synced):
+            if isinstance(events, httpx.HTTPError):
+                failed.append(calendar_id)
+                continue
+            if isinstance(events, BaseException):
+                raise events
+            entry = self.event_cache.get((self._user_key(session_id), calendar_id))
+            if entry is not None:
+                index, by_id = entry.search_index(), entry.events
+            else:
+                # Evicted already because the cache is smaller than this user's calendars
+                index, by_id = EventIndex(events), {event["id"]: event for event in events}
+            matches.extend((start, calendar_id, by_id[event_id]) for start, event_id in index.search(terms, window_start, window_end))
+
+        matches.sort(key=lambda match: match[0])
+        header = f"{len(matches)} matching events" + (f", showing the first {max_results}" if len(matches) > max_results else "")
+        if failed:
+            header += f"\nCould not read: {", ".join(failed)}"
+        rows = ({"calendar_id": calendar_id, **event_row(event)} for _, calendar_id, event in matches[:max_results])
+        return format_rows(rows, selected_fields, output_format, max_chars, header)
+
+    async def watch_calendar(self, session_id: str, calendar_id: str) -> str:
+        """
+        Subscribes to Google push notifications for changes to a calendar, use this instead of calling list_events repeatedly to detect changes
+        While watched, list_events and search_events on the calendar answer from memory and only ask Google for what changed after a notification
+        The subscription is renewed automatically for as long as the session lasts
+        Assumes user has gone through authentication
+        Args:
+            session_id: Session id obtained from get_url
+            calendar_id: Id of calendar either from create_calendar or list_calendars
+        """
+        if not self.receives_notifications:
+            return "Watching calendars needs the MCP to run in http mode, where Google can deliver notifications"
+        key = (self._user_key(session_id), calendar_id)
+        channel = self.watches.channels.get(key)
+        if channel is None or channel.expires_at <= time.time():
+            channel = await self._watch(session_id, calendar_id)
+        # Synced after the channel exists so no change falls between the two
+        await self._sync_events(session_id, calendar_id)
+        expires = datetime.fromtimestamp(channel.expires_at, timezone.utc)
+        return f"Watching {calendar_id}, the subscription expires {expires.isoformat()} and is renewed before then"
+
+    # Opens a channel for the calendar, replacing and stopping any earlier one
+    async def _watch(self, session_id, calendar_id, background=False):
+        key = (self._user_key(session_id), calendar_id)
+        channel_id = uuid.uuid4().hex
+        res = await self._request("POST", session_id, f"/calendars/{calendar_id}/events/watch", background=background, json={
+            "id": channel_id,
+            "type": "web_hook",
+            "address": WEBHOOK_URL,
+            "token": self.watches.token(channel_id, key),
+            "params": {"ttl": str(WATCH_CHANNEL_TTL)},
+        })
+        res.raise_for_status()
+        body = res.json()
+        channel = Channel(channel_id, body["resourceId"], int(body["expiration"]) / 1000, session_id)
+        previous = self.watches.put(key, channel)
+        if previous is not None:
+            await self._stop_channel(previous)
+        return channel
+
+    async def _stop_channel(self, channel):
+        try:
+            res = await self._request("POST", channel.session_id, "/channels/stop", background=True, json={"id": channel.id, "resourceId": channel.resource_id})
             res.raise_for_status()
-        return "Successfully deleted!"
+        except httpx.HTTPError:
+            # An unstopped channel lapses at its expiry, its notifications only cost a delta sync
+            logger.warning("Could not stop watch channel %s", channel.id, exc_info=True)
+
+    async def _renew_watches(self):
+        while True:
+            await asyncio.sleep(WATCH_RENEW_CHECK_INTERVAL)
+            now = time.time()
+            for key, channel in self.watches.due(now + WATCH_RENEW_MARGIN):
+                session = self.auth.sessions.peek(channel.session_id)
+                if session is None or now - session.last_used >= self.auth.sessions.idle_ttl:
+                    # Nobody is left to read the calendar, let the channel lapse
+                    self.watches.remove(key)
+                    continue
+                try:
+                    await self._watch(channel.session_id, key[1], background=True)
+                except httpx.HTTPError:
+                    logger.warning("Could not renew watch on %s", key[1], exc_info=True)
+                    # Retried on the next check until the channel expires, then dropped
+                    if channel.expires_at <= time.time():
+                        self.watches.remove(key)
+
+    async def _stop_watches(self):
+        channels = list(self.watches.channels.values())
+        self.watches.channels.clear()
+        await asyncio.gather(*(self._stop_channel(channel) for channel in channels))
+
+    async def calendar_webhook(self, request):
+        from starlette.responses import Response
+
+        key = self.watches.verify(request.headers.get("X-Goog-Channel-ID"), request.headers.get("X-Goog-Channel-Token"))
+        if key is None:
+            WEBHOOK_NOTIFICATIONS.inc("rejected")
+            return Response(status_code=403)
+        # sync is sent once when a channel opens and carries no change
+        state = request.headers.get("X-Goog-Resource-State", "")
+        if state != "sync":
+            self.watches.notify(key)
+        WEBHOOK_NOTIFICATIONS.inc(state or "unknown")
+        return Response(status_code=200)
+
+    # Export and import files are confined to ICS_DIR so a tool call cannot reach arbitrary paths
+    def _ics_path(self, file_path):
+        root = os.path.realpath(ICS_DIR)
+        path = os.path.realpath(os.path.join(root, file_path))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"{file_path} is outside the export directory")
+        # Checked once symlinks are resolved, so a link named .ics cannot stand in for another file
+        if not path.lower().endswith(".ics"):
+            raise ValueError(f"{file_path} is not an .ics file")
+        return path
+
+    async def export_calendar(self, session_id: str, calendar_id: str, file_path: str, ctx: Context) -> str:
+        """
+        Saves every event of a calendar to an iCalendar (.ics) file, use this to back up or migrate a whole calendar
+        Events are written page by page as they are fetched, so calendars of any size can be exported
+        Recurring events are written last, with their cancelled occurrences as EXDATEs
+        Assumes user has gone through authentication
+        Args:
+            session_id: Session id obtained from get_url
+            calendar_id: The id of the calendar to export from list_calendars
+            file_path: Path of the file to write, ending in .ics and relative to the server's export directory, an existing export is replaced
+        """
+        try:
+            path = self._ics_path(file_path)
+        except ValueError as e:
+            return f"Cannot export: {e}"
+        if os.path.exists(path) and not os.path.isfile(path):
+            return f"Cannot export: {file_path} exists and is not a file"
+        names = {item["id"]: item.get("summary") for item in await self._calendar_list(session_id)}
+        stamp = datetime.now(timezone.utc)
+        exported = 0
+        start = time.perf_counter()
+        # Written next to the target and moved into place once complete, a failed export leaves no partial file
+        # The partial file is created exclusively, so nothing already there (such as a planted symlink) is written through
+        partial = f"{path}.{uuid.uuid4().hex}.part"
+        # Google lists a cancelled occurrence as its own event with no times, so recurring events are held back
+        # until the listing ends and the occurrences are written as EXDATEs of the series instead
+        series = {}
+        cancelled = {}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(partial, "x", encoding="utf-8", newline="") as f:
+                f.write(ics.header(names.get(calendar_id)))
+                async for page in self._iter_pages(session_id, calendar_id, {"fields": EXPORT_FIELDS}):
+                    written = []
+                    for event in page.get("items", []):
+                        if event.get("status") == "cancelled" and "recurringEventId" in event:
+                            if "originalStartTime" in event:
+                                cancelled.setdefault(event["recurringEventId"], []).append(event["originalStartTime"])
+                        elif "recurrence" in event:
+                            series[event["id"]] = event
+                        else:
+                            written.append(ics.format_event(event, stamp))
+                    f.write("".join(written))
+                    exported += len(written)
+                    await ctx.report_progress(exported, message=f"{exported} events exported")
+                for event_id, event in series.items():
+                    f.write(ics.format_event(event, stamp, cancelled.get(event_id, ())))
+                exported += len(series)
+                f.write(ics.footer())
+            os.replace(partial, path)
+        except OSError as e:
+            return f"Cannot export: {e}"
+        finally:
+            if os.path.lexists(partial):
+                os.remove(partial)
+        elapsed = time.perf_counter() - start
+        return f"Exported {exported} events to {file_path} in {elapsed:.1f}s ({exported / max(elapsed, 1e-6):.0f} events/s)"
+
+    async def import_calendar(self, session_id: str, calendar_id: str, file_path: str, ctx: Context, time_zone: str = "UTC") -> str:
+        """
+        Adds every event in an iCalendar (.ics) file to a calendar, use this to restore or migrate a whole calendar
+        The file is read as events are sent, so files of any size can be imported. Imported events count as MCP generated
+        Changed or cancelled single occurrences of recurring events (RECURRENCE-ID) are skipped
+        Assumes user has gone through authentication
+        Args:
+            session_id: Session id obtained from get_url
+            calendar_id: The id of calendar the events should be added to, is returned from create_calendar
+            file_path: Path of the file to read, ending in .ics and relative to the server's export directory
+            time_zone: IANA time zone for times in the file that have none (optional default UTC)
+        """
+        try:
+            source = open(self._ics_path(file_path), "rb")
+        except (OSError, ValueError) as e:
+            return f"Cannot import: {e}"
+        total_bytes = os.fstat(source.fileno()).st_size
+        read_bytes = 0
+        counts = {"imported": 0, "failed": 0, "skipped": 0}
+        # Only the first failures are kept for the report, the rest are counted
+        failures = []
+        stopped = None
+
+        def fail(message):
+            counts["failed"] += 1
+            if len(failures) < MAX_LISTED_IMPORT_FAILURES:
+                failures.append(message)
+
+        def read_lines():
+            nonlocal read_bytes
+            for line in source:
+                read_bytes += len(line)
+                yield line.decode("utf-8", errors="replace")
+
+        def input_jsons():
+            for properties in ics.iter_vevents(read_lines()):
+                try:
+                    event = ics.vevent_to_event(properties, time_zone)
+                except ValueError as e:
+                    fail(f"invalid event ({e})")
+                    continue
+                if event is None:
+                    counts["skipped"] += 1
+                    continue
+                # The original description is kept, the extended property is what marks the event as MCP generated
+                event.setdefault("description", self.MCP_DESCRIPTION)
+                yield mark_owned(event)
+
+        # Workers pull batches from one shared generator, so at most IMPORT_CONCURRENCY batches are held in memory
+        chunks = batched(input_jsons(), MAX_BATCH_SIZE)
+
+        async def worker():
+            nonlocal stopped
+            for chunk in chunks:
+                if stopped is not None:
+                    break
+                try:
+                    results = await self._batch_insert(session_id, calendar_id, chunk)
+                except httpx.HTTPStatusError as e:
+                    # Every later batch would be refused the same way
+                    stopped = f"a batch request returned {e.response.status_code}"
+                    results = [f"failed: batch request returned {e.response.status_code}"] * len(chunk)
+                except (httpx.HTTPError, ValueError) as e:
+                    results = [f"failed: {e!r}"] * len(chunk)
+                else:
+                    # Google answers each part on its own, so an unknown or read-only calendar refuses every part alike
+                    refused = {result.partition(":")[0] for result in results}
+                    if len(refused) == 1 and (status := refused.pop()) in ("failed (403)", "failed (404)"):
+                        stopped = f"every event in a batch {status}"
+                for event, result in zip(chunk, results):
+                    if result.startswith("event_id"):
+                        counts["imported"] += 1
+                    else:
+                        fail(f"{event.get("summary", "n/a")}: {result}")
+                await ctx.report_progress(read_bytes, total_bytes, f"{counts["imported"]} events imported")
+
+        start = time.perf_counter()
+        with source:
+            await asyncio.gather(*(worker() for _ in range(IMPORT_CONCURRENCY)))
+        elapsed = time.perf_counter() - start
+
+        lines = [
+            f"Imported {counts["imported"]} events in {elapsed:.1f}s ({counts["imported"] / max(elapsed, 1e-6):.0f} events/s), "
+            f"{counts["failed"]} failed, {counts["skipped"]} skipped"
+        ]
+        if stopped is not None:
+            lines.append(f"Import stopped because {stopped}, the rest of the file was not sent")
+        lines.extend(failures)
+        if counts["failed"] > len(failures):
+            lines.append(f"... and {counts["failed"] - len(failures)} more failures")
+        return "\n".join(lines)
+
+    def _occurrences(self, time_zone, start_date_time, end_date_time, recurrence):
+        start = datetime.strptime(start_date_time, "%Y-%m-%dT%H:%M:%S")
+        end = datetime.strptime(end_date_time, "%Y-%m-%dT%H:%M:%S")
+        horizon = (start + CONFLICT_HORIZON).replace(tzinfo=ZoneInfo(time_zone))
+        return expand(start, end, recurrence, horizon)
+
+    # Overlaps between occurrences and the calendar's busy time, an event being patched is left out of its own busy time
+    # Returns (conflicts, errors), errors naming calendars whose busy times could not be read,
+    # which must not be taken as free
+    async def _find_conflicts(self, session_id, calendar_id, occurrences, exclude_event_id=None):
+        if not occurrences:
+            return [], []
+        window_start = occurrences[0][0]
+        window_end = max(end for _, end in occurrences)
+        if exclude_event_id is None:
+            busy, errors = await self._fetch_busy(session_id, [calendar_id], window_start, window_end)
+        else:
+            busy, errors = await self._busy_from_events(session_id, calendar_id, window_start, window_end, exclude_event_id), []
+        return find_conflicts(occurrences, busy), errors
+
+    # freeBusy cannot leave out one event, so this expands instances from the events listing instead
+    async def _busy_from_events(self, session_id, calendar_id, window_start, window_end, exclude_event_id):
+        params = {
+            "fields": "nextPageToken,items(id,recurringEventId,status,transparency,start,end)",
+            "timeMin": window_start.isoformat(),
+            "timeMax": window_end.isoformat(),
+            "singleEvents": "true",
+        }
+        busy = []
+        async for event in self._iter_events(session_id, calendar_id, params):
+            if exclude_event_id in (event["id"], event.get("recurringEventId")):
+                continue
+            if event.get("transparency") == "transparent" or event.get("status") == "cancelled":
+                continue
+            if "dateTime" not in event.get("start", {}):
+                # All day events only block time when marked busy, which is not the default
+                continue
+            busy.append((parse_rfc3339(event["start"]["dateTime"]), parse_rfc3339(event["end"]["dateTime"])))
+        return merge_intervals(busy)
+
+    def _conflict_report(self, conflicts, time_zone, footer):
+        tz = ZoneInfo(time_zone)
+        lines = [f"{len(conflicts)} conflicting occurrence(s) ({time_zone}):"]
+        for (start, end), (busy_start, busy_end) in conflicts[:MAX_LISTED_CONFLICTS]:
+            busy_start, busy_end = busy_start.astimezone(tz), busy_end.astimezone(tz)
+            lines.append(f"{start:%Y-%m-%d %a %H:%M}-{end:%H:%M} overlaps busy {busy_start:%Y-%m-%d %H:%M}-{busy_end:%H:%M}")
+        if len(conflicts) > MAX_LISTED_CONFLICTS:
+            lines.append(f"... {len(conflicts) - MAX_LISTED_CONFLICTS} more")
+        lines.append(footer)
+        return "\n".join(lines)
+
+    async def preview_event(
+        self,
+        time_zone: str,
+        start_date_time: str,
+        end_date_time: str,
+        repeats: bool = False,
+        repeat_days: str | None = None,
+        final_repeat_date: str | None = None,
+        session_id: str | None = None,
+        calendar_id: str | None = None,
+        max_listed: int = 20,
+    ) -> str:
+        """
+        Previews every occurrence an event would have before inserting it, and checks them for conflicts when a calendar is given
+        Takes the same timing arguments as insert_event
+        All datetime arguments are formatted as such YYYY-MM-DDTHH:MM:SS (do not include Z at the end)
+        Weekday abbreviations are according to RFC: SU, MO, TU, WE, TH, FR, SA
+        Args:
+            time_zone: The time zone the event will take place in formatted according to IANA time zone database such as America/New_York
+            start_date_time: The start time of the event, the start of the first event if the event repeats
+            end_date_time: The end time of the event, the end of the first event if the event repeats
+            repeats: Whether the event repeats or not (optional default False)
+            repeat_days: A string containing the days that the event repeats weekly comma separated (i.e. TU,TH) (optional)
+            final_repeat_date: A datetime string indicating the cutoff date for repetitions (optional)
+            session_id: Session id obtained from get_url, needed to check conflicts (optional)
+            calendar_id: Calendar to check conflicts against (optional)
+            max_listed: Number of occurrences to list (optional default 20)
+        """
+        recurrence = self._weekly_recurrence(repeat_days, final_repeat_date) if repeats else None
+        occurrences = self._occurrences(time_zone, start_date_time, end_date_time, recurrence)
+        lines = [f"{len(occurrences)} occurrence(s) ({time_zone}):"]
+        for start, end in occurrences[:max_listed]:
+            lines.append(f"{start:%Y-%m-%d %a %H:%M}-{end:%H:%M}")
+        if len(occurrences) > max_listed:
+            lines.append(f"... {len(occurrences) - max_listed} more, last on {occurrences[-1][0]:%Y-%m-%d}")
+        if session_id and calendar_id:
+            conflicts, errors = await self._find_conflicts(session_id, calendar_id, occurrences)
+            if errors:
+                lines.append(f"Could not check conflicts: {", ".join(errors)}")
+            elif conflicts:
+                lines.append(self._conflict_report(conflicts, time_zone, "Resolve these before inserting"))
+            else:
+                lines.append("No conflicts")
+        return "\n".join(lines)
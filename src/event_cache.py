@@ -0,0 +1,99 @@
+from collections import OrderedDict
+import os
+import time
+
+from search_index import EventIndex
+
+EVENT_CACHE_MAX_EVENTS = int(os.getenv("EVENT_CACHE_MAX_EVENTS", "50000"))
+
+class CalendarEntry:
+    __slots__ = ("events", "sync_token", "synced_at", "index")
+
+    def __init__(self, events, sync_token):
+        self.events = events
+        self.sync_token = sync_token
+        self.synced_at = time.monotonic()
+        self.index = None
+
+    # Built on first search and kept current by every later change to the entry
+    def search_index(self):
+        if self.index is None:
+            self.index = EventIndex(self.events.values())
+        return self.index
+
+class EventCache:
+    """
+    Per (user, calendar_id) event snapshots kept current with the Calendar API syncToken protocol
+    Calendars are evicted least recently used first once the total number of cached events
+    goes over max_events
+    """
+    def __init__(self, max_events=EVENT_CACHE_MAX_EVENTS):
+        self.max_events = max_events
+        self.size = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, events, sync_token):
+        self.invalidate(key)
+        self._entries[key] = CalendarEntry({event["id"]: event for event in events}, sync_token)
+        self.size += len(self._entries[key].events)
+        self._evict()
+
+    def apply(self, key, changes, sync_token):
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        for event in changes:
+            self._set(entry, event)
+        entry.sync_token = sync_token
+        entry.synced_at = time.monotonic()
+        self._evict()
+
+    def upsert_event(self, key, event):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._set(entry, event)
+            self._evict()
+
+    def remove_event(self, key, event_id):
+        entry = self._entries.get(key)
+        if entry is not None and entry.events.pop(event_id, None) is not None:
+            self.size -= 1
+            if entry.index is not None:
+                entry.index.remove(event_id)
+
+    def invalidate(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry.events)
+
+    def _set(self, entry, event):
+        existed = event["id"] in entry.events
+        if event.get("status") == "cancelled":
+            if existed:
+                del entry.events[event["id"]]
+                self.size -= 1
+                if entry.index is not None:
+                    entry.index.remove(event["id"])
+            return
+        entry.events[event["id"]] = event
+        if entry.index is not None:
+            entry.index.add(event)
+        if not existed:
+            self.size += 1
+
+    def _evict(self):
+        # The most recently used calendar is kept even if it alone is over the limit
+        while self.size > self.max_events and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self.size -= len(entry.events)
+            self.evictions += 1
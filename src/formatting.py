@@ -0,0 +1,74 @@
+import json
+
+OUTPUT_FORMATS = ("text", "table", "jsonl")
+DEFAULT_MAX_CHARS = 20000
+
+EVENT_FIELDS = ("event_id", "name", "description", "start", "end", "location", "recurrence")
+CALENDAR_FIELDS = ("name", "id")
+SEARCH_FIELDS = ("calendar_id", *EVENT_FIELDS)
+
+def format_time(value):
+    # All-day events carry a date instead of a dateTime
+    if "date" in value:
+        return f"{value["date"]} (all day)"
+    if "timeZone" in value:
+        return f"{value.get("dateTime", "")} {value["timeZone"]}"
+    return value.get("dateTime", "")
+
+def event_row(event):
+    return {
+        "event_id": event["id"],
+        "name": event.get("summary", ""),
+        "description": event.get("description", ""),
+        "start": format_time(event.get("start", {})),
+        "end": format_time(event.get("end", {})),
+        "location": event.get("location", ""),
+        "recurrence": " ".join(event.get("recurrence", [])),
+    }
+
+def calendar_row(item):
+    return {"name": item.get("summary", ""), "id": item["id"]}
+
+def parse_fields(fields, allowed):
+    if not fields:
+        return list(allowed)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields {", ".join(unknown)}, choose from {", ".join(allowed)}")
+    return selected
+
+def _flat(value):
+    return " ".join(str(value).split())
+
+def _lines(rows, fields, output_format):
+    if output_format == "table":
+        yield False, "\t".join(fields)
+        for row in rows:
+            yield True, "\t".join(_flat(row[field]) for field in fields)
+    elif output_format == "jsonl":
+        for row in rows:
+            yield True, json.dumps({field: row[field] for field in fields if row[field]}, ensure_ascii=False)
+    else:
+        for row in rows:
+            # Empty fields are left out to keep listings short
+            yield True, "\n".join(f"{field}: {_flat(row[field])}" for field in fields if row[field]) + "\n"
+
+def format_rows(rows, fields, output_format="text", max_chars=DEFAULT_MAX_CHARS, header=None):
+    """
+    Renders rows lazily and joins them once, stopping at max_chars with a marker saying how many rows were left out
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}, choose from {", ".join(OUTPUT_FORMATS)}")
+    rows = iter(rows)
+    parts = [header] if header else []
+    used = sum(len(part) + 1 for part in parts)
+    for is_row, line in _lines(rows, fields, output_format):
+        if max_chars and used + len(line) + 1 > max_chars:
+            # Rows still in the iterator are counted without being rendered
+            remaining = int(is_row) + sum(1 for _ in rows)
+            parts.append(f"[truncated: {remaining} more, narrow the query or raise max_chars]")
+            break
+        parts.append(line)
+        used += len(line) + 1
+    return "\n".join(parts)
@@ -0,0 +1,70 @@
+import os
+import time
+
+import httpx
+
+from metrics import LOG_SPANS, UPSTREAM_BYTES, UPSTREAM_DURATION, UPSTREAM_RESPONSES, endpoint_label, logger
+
+# Pool and timeout settings for the shared upstream client, overridable via env
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP2 = os.getenv("HTTP2", "true").lower() in ("1", "true", "yes")
+
+class CountingStream(httpx.AsyncByteStream):
+    """
+    Response body stream that records the bytes read off the wire
+    """
+    def __init__(self, stream):
+        self._stream = stream
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            UPSTREAM_BYTES.inc("received", amount=len(chunk))
+            yield chunk
+
+    async def aclose(self):
+        await self._stream.aclose()
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    Records latency, status and bytes of every upstream request
+    """
+    def __init__(self, transport):
+        self._transport = transport
+
+    async def handle_async_request(self, request):
+        endpoint = endpoint_label(request.url.path)
+        UPSTREAM_BYTES.inc("sent", amount=int(request.headers.get("Content-Length", 0)))
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception:
+            UPSTREAM_RESPONSES.inc(request.method, endpoint, "error")
+            raise
+        elapsed = time.perf_counter() - start
+        UPSTREAM_DURATION.observe(elapsed, request.method, endpoint)
+        UPSTREAM_RESPONSES.inc(request.method, endpoint, str(response.status_code))
+        if LOG_SPANS:
+            logger.info("upstream=%s %s status=%d duration_ms=%.1f", request.method, endpoint, response.status_code, elapsed * 1000)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=CountingStream(response.stream),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+def create_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT)
+    transport = InstrumentedTransport(httpx.AsyncHTTPTransport(http2=HTTP2, limits=limits))
+    return httpx.AsyncClient(transport=transport, timeout=timeout)
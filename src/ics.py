@@ -0,0 +1,190 @@
+from datetime import datetime, timedelta, timezone
+import re
+
+PRODID = "-//calendar-mcp//EN"
+# Content lines longer than this many octets are folded (RFC 5545 3.1)
+MAX_LINE_OCTETS = 75
+RECURRENCE_PROPERTIES = ("RRULE", "EXRULE", "RDATE", "EXDATE")
+DURATION_PATTERN = re.compile(r"([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?")
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+def unescape(value):
+    return re.sub(r"\\([\\;,nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+def fold(line):
+    encoded = line.encode()
+    if len(encoded) <= MAX_LINE_OCTETS:
+        return line + "\r\n"
+    parts = []
+    start = 0
+    limit = MAX_LINE_OCTETS
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Never split inside a UTF-8 sequence
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start = end
+        # Continuation lines spend one octet on the leading space
+        limit = MAX_LINE_OCTETS - 1
+    return "\r\n ".join(parts) + "\r\n"
+
+def header(name=None):
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN"]
+    if name:
+        lines.append(f"X-WR-CALNAME:{escape(name)}")
+    return "".join(fold(line) for line in lines)
+
+def footer():
+    return "END:VCALENDAR\r\n"
+
+def _format_time(name, value):
+    if "date" in value:
+        return f"{name};VALUE=DATE:{value["date"].replace("-", "")}"
+    moment = datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+    if "timeZone" in value:
+        # IANA names are used as TZIDs without VTIMEZONE blocks, which is what Google and most clients read
+        from zoneinfo import ZoneInfo
+        local = moment.astimezone(ZoneInfo(value["timeZone"])) if moment.tzinfo else moment
+        return f"{name};TZID={value["timeZone"]}:{local:%Y%m%dT%H%M%S}"
+    return f"{name}:{moment.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}"
+
+def format_event(event, stamp, exdates=()):
+    """
+    One VEVENT for a Calendar API event, stamp is the DTSTAMP shared by the export
+    exdates are the originalStartTime of cancelled occurrences of a recurring event, written as EXDATEs
+    """
+    lines = ["BEGIN:VEVENT", f"UID:{event.get("iCalUID") or event["id"]}", f"DTSTAMP:{stamp:%Y%m%dT%H%M%SZ}"]
+    if "start" in event:
+        lines.append(_format_time("DTSTART", event["start"]))
+    if "end" in event:
+        lines.append(_format_time("DTEND", event["end"]))
+    if "originalStartTime" in event:
+        # A changed occurrence of a recurring event, it shares the UID of the series
+        lines.append(_format_time("RECURRENCE-ID", event["originalStartTime"]))
+    for name, key in (("SUMMARY", "summary"), ("DESCRIPTION", "description"), ("LOCATION", "location")):
+        if event.get(key):
+            lines.append(f"{name}:{escape(event[key])}")
+    if event.get("status") in ("tentative", "cancelled"):
+        lines.append(f"STATUS:{event["status"].upper()}")
+    lines.extend(event.get("recurrence", []))
+    lines.extend(_format_time("EXDATE", exdate) for exdate in exdates)
+    lines.append("END:VEVENT")
+    return "".join(fold(line) for line in lines)
+
+def _unfolded(lines):
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+def _parse_line(line):
+    # NAME;PARAM=VALUE;PARAM="QUOTED":VALUE, the value may itself contain colons
+    in_quotes = False
+    for i, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ":" and not in_quotes:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        return None
+    name, *raw_params = head.split(";")
+    params = {}
+    for param in raw_params:
+        key, _, param_value = param.partition("=")
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+def iter_vevents(lines):
+    """
+    Lazily yields each VEVENT in an iCalendar stream as a list of (name, params, value)
+    lines may be any iterable of text lines, such as an open file
+    """
+    properties = None
+    for line in _unfolded(lines):
+        parsed = _parse_line(line)
+        if parsed is None:
+            continue
+        name, params, value = parsed
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            properties = []
+        elif name == "END" and value.upper() == "VEVENT":
+            if properties is not None:
+                yield properties
+            properties = None
+        elif properties is not None:
+            properties.append((name, params, value))
+
+def _parse_time(params, value, default_time_zone):
+    if params.get("VALUE") == "DATE" or (len(value) == 8 and value.isdigit()):
+        return {"date": f"{value[:4]}-{value[4:6]}-{value[6:8]}"}
+    moment = datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        return {"dateTime": f"{moment:%Y-%m-%dT%H:%M:%S}Z"}
+    # Floating times are read in the importer's time zone
+    return {"dateTime": f"{moment:%Y-%m-%dT%H:%M:%S}", "timeZone": params.get("TZID", default_time_zone)}
+
+def _parse_duration(value):
+    match = DURATION_PATTERN.fullmatch(value)
+    if match is None:
+        raise ValueError(f"Invalid duration {value!r}")
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0), minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -duration if sign == "-" else duration
+
+def _shift(start, duration):
+    if "date" in start:
+        return {"date": (datetime.fromisoformat(start["date"]) + duration).date().isoformat()}
+    moment = datetime.fromisoformat(start["dateTime"].rstrip("Z")) + duration
+    shifted = {**start, "dateTime": f"{moment:%Y-%m-%dT%H:%M:%S}"}
+    if start["dateTime"].endswith("Z"):
+        shifted["dateTime"] += "Z"
+    return shifted
+
+def vevent_to_event(properties, default_time_zone="UTC"):
+    """
+    Calendar API event JSON for a parsed VEVENT, or None for ones that cannot be inserted on their own
+    (cancelled events and overrides of a single occurrence, which carry a RECURRENCE-ID)
+    Raises ValueError for malformed events
+    """
+    event = {}
+    recurrence = []
+    duration = None
+    for name, params, value in properties:
+        if name == "RECURRENCE-ID" or (name == "STATUS" and value.upper() == "CANCELLED"):
+            return None
+        if name == "SUMMARY":
+            event["summary"] = unescape(value)
+        elif name == "DESCRIPTION":
+            event["description"] = unescape(value)
+        elif name == "LOCATION":
+            event["location"] = unescape(value)
+        elif name == "DTSTART":
+            event["start"] = _parse_time(params, value, default_time_zone)
+        elif name == "DTEND":
+            event["end"] = _parse_time(params, value, default_time_zone)
+        elif name == "DURATION":
+            duration = _parse_duration(value)
+        elif name == "STATUS" and value.upper() == "TENTATIVE":
+            event["status"] = "tentative"
+        elif name in RECURRENCE_PROPERTIES:
+            param_text = "".join(f";{key}={param}" for key, param in params.items())
+            recurrence.append(f"{name}{param_text}:{value}")
+    if "start" not in event:
+        raise ValueError("VEVENT has no DTSTART")
+    if "end" not in event:
+        # Without DTEND an event lasts its DURATION, or a day for dates and no time at all otherwise
+        event["end"] = _shift(event["start"], duration if duration is not None else timedelta(days=1 if "date" in event["start"] else 0))
+    if recurrence:
+        event["recurrence"] = recurrence
+    return event
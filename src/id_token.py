@@ -0,0 +1,76 @@
+import os
+import re
+import time
+
+from singleflight import SingleFlight
+
+# Overridable to point logins at a stand-in server, see bench/fake_google.py
+JWKS_URL = os.getenv("JWKS_URL", "https://www.googleapis.com/oauth2/v3/certs")
+ISSUERS = ("https://accounts.google.com", "accounts.google.com")
+# Used when the key set response carries no Cache-Control max-age
+DEFAULT_JWKS_MAX_AGE = 3600
+# An unknown kid refetches the key set at most this often, id_tokens come straight from
+# the token endpoint so this only bounds refetching when something is off
+JWKS_REFETCH_INTERVAL = 1
+CLOCK_SKEW = 60
+
+class IdTokenVerifier:
+    """
+    Verifies Google id_tokens locally against Google's signing keys
+    The key set is cached for its Cache-Control max-age and refetched early when a token
+    is signed with a kid it does not contain, which is how key rotation shows up
+    """
+    def __init__(self, get_client, audience, jwks_url=JWKS_URL):
+        self._get_client = get_client
+        self.audience = audience
+        self.jwks_url = jwks_url
+        self._keys = {}
+        self._expires_at = 0
+        self._fetched_at = 0
+        self._fetches = SingleFlight()
+        self.fetches = 0
+
+    async def verify(self, token):
+        # PyJWT pulls in cryptography, imported here rather than at module level to keep stdio startup fast
+        import jwt
+
+        if not token:
+            raise jwt.InvalidTokenError("Token response has no id_token")
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = await self._key(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"id_token is signed with unknown key {kid!r}")
+        return jwt.decode(
+            token, key,
+            algorithms=["RS256"],
+            audience=self.audience,
+            issuer=ISSUERS,
+            leeway=CLOCK_SKEW,
+            options={"require": ["exp", "iat", "iss", "aud", "sub"]},
+        )
+
+    async def _key(self, kid):
+        stale = time.monotonic() >= self._expires_at
+        rotated = kid not in self._keys and time.monotonic() - self._fetched_at >= JWKS_REFETCH_INTERVAL
+        if stale or rotated:
+            # Logins arriving together share one fetch
+            await self._fetches.do(self.jwks_url, self._fetch)
+        return self._keys.get(kid)
+
+    async def _fetch(self):
+        import jwt
+
+        res = await self._get_client().get(self.jwks_url)
+        res.raise_for_status()
+        self.fetches += 1
+        keys = {}
+        for jwk in res.json().get("keys", []):
+            try:
+                keys[jwk["kid"]] = jwt.PyJWK(jwk).key
+            except (KeyError, jwt.PyJWKError):
+                continue
+        match = re.search(r"max-age=(\d+)", res.headers.get("Cache-Control", ""))
+        max_age = int(match.group(1)) if match else DEFAULT_JWKS_MAX_AGE
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + max_age
@@ -1,31 +1,58 @@
+from contextlib import asynccontextmanager
 import os
 
 from dotenv import load_dotenv
-from starlette.applications import Starlette
-from starlette.routing import Mount
-import uvicorn
+
+# Loaded before the local imports, which read their settings at import time
+load_dotenv()
 
 from calendar_mcp import CalendarMcp
+from metrics import metrics_endpoint
 from oauth import OAuth
 
-load_dotenv()
+# Number of uvicorn worker processes in http mode, more than one needs SESSION_BACKEND=sqlite
+WORKERS = int(os.getenv("WORKERS", "1"))
+PORT = int(os.getenv("PORT", "5000"))
+
+# For http mode, also used as the app factory by each worker process
+def create_app():
+    from starlette.applications import Starlette
+    from starlette.routing import Mount, Route
 
-if __name__ == "__main__":
     auth = OAuth()
     mcp = CalendarMcp(auth)
+    mcp_app = mcp.get_asgi_app(stateless=WORKERS > 1)
+    auth_app = auth.get_asgi_app()
+    webhook_app = mcp.get_webhook_app()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with mcp.lifespan(), mcp_app.lifespan(app):
+            yield
+
+    return Starlette(
+        routes=[
+            Mount("/mcp", app=mcp_app),
+            Mount("/auth", app=auth_app),
+            Mount("/webhook", app=webhook_app),
+            Route("/metrics", endpoint=metrics_endpoint),
+        ],
+        lifespan=lifespan,
+    )
+
+if __name__ == "__main__":
     if os.getenv("MODE") == "stdio":
+        auth = OAuth()
+        mcp = CalendarMcp(auth)
         auth.run()
         mcp.run() # blocking
     elif os.getenv("MODE") == "http":
-        mcp_app = mcp.get_asgi_app()
-        auth_app = auth.get_asgi_app()
-        server = Starlette(
-            routes=[
-                Mount("/mcp", app=mcp_app),
-                Mount("/auth", app=auth_app)
-            ],
-            lifespan=mcp_app.lifespan,
-        )
-        uvicorn.run(server, host="0.0.0.0", port=5000)
+        import uvicorn
+        if WORKERS > 1 and os.getenv("SESSION_BACKEND", "memory") == "memory":
+            print("WORKERS > 1 requires SESSION_BACKEND=sqlite so workers share sessions")
+        elif WORKERS > 1:
+            uvicorn.run("main:create_app", factory=True, host="0.0.0.0", port=PORT, workers=WORKERS)
+        else:
+            uvicorn.run(create_app(), host="0.0.0.0", port=PORT)
     else:
         print("env variable MODE must either be 'stdio' or 'http'")
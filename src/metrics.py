@@ -0,0 +1,156 @@
+from bisect import bisect_left
+import functools
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Writes a timing line for every tool call and upstream request when enabled
+LOG_SPANS = os.getenv("METRICS_LOG_SPANS", "false").lower() in ("1", "true", "yes")
+# Seconds, from a cache hit to a slow Google round trip
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Spans go to stderr, which stays clear of the stdio transport
+if LOG_SPANS:
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Registry:
+    """
+    Metrics rendered together in the Prometheus text format
+    """
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name, help, labels=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._function = None
+        registry.register(self)
+
+    # Values read at scrape time from state kept elsewhere, fn returns a number or {label values: number}
+    def set_function(self, fn):
+        self._function = fn
+
+    def _current(self):
+        if self._function is None:
+            return self._values
+        values = self._function()
+        return values if isinstance(values, dict) else {(): values}
+
+    def samples(self):
+        for values, value in self._current().items():
+            yield f"{self.name}{_labels(self.labels, values)} {value}"
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *values, amount=1):
+        self._values[values] = self._values.get(values, 0) + amount
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value, *values):
+        self._values[values] = value
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        super().__init__(name, help, labels, registry)
+        self.buckets = buckets
+
+    # Per bucket counts are kept non-cumulative so an observation touches one slot
+    def observe(self, value, *values):
+        series = self._values.get(values)
+        if series is None:
+            series = self._values[values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self):
+        for values, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labels, values, f'le="{bound}"')} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, values)} {total}"
+            yield f"{self.name}_count{_labels(self.labels, values)} {cumulative}"
+
+TOOL_DURATION = Histogram("calendar_mcp_tool_duration_seconds", "Tool call latency", ("tool", "outcome"))
+UPSTREAM_DURATION = Histogram("calendar_mcp_upstream_duration_seconds", "Google API latency until response headers", ("method", "endpoint"))
+UPSTREAM_RESPONSES = Counter("calendar_mcp_upstream_responses_total", "Google API responses by status, error for transport failures", ("method", "endpoint", "status"))
+UPSTREAM_BYTES = Counter("calendar_mcp_upstream_bytes_total", "Bytes sent to and received from Google APIs", ("direction",))
+LOGINS = Counter("calendar_mcp_logins_total", "Completed login callbacks", ("outcome",))
+TOKEN_REFRESHES = Counter("calendar_mcp_token_refreshes_total", "Access token refreshes", ("outcome",))
+SESSIONS = Gauge("calendar_mcp_sessions", "Sessions in the session store", ("state",))
+WEBHOOK_NOTIFICATIONS = Counter("calendar_mcp_webhook_notifications_total", "Push notifications received, rejected for bad channel tokens", ("outcome",))
+SESSIONS_REMOVED = Counter("calendar_mcp_sessions_removed_total", "Sessions dropped by the session store", ("reason",))
+
+# Ids in Calendar API paths are replaced so each endpoint is one series
+ID_PARENTS = ("calendars", "events")
+PATH_ACTIONS = ("watch", "instances", "import", "quickAdd", "move")
+
+def endpoint_label(path):
+    segments = path.split("/")
+    for i in range(1, len(segments)):
+        if segments[i - 1] in ID_PARENTS and segments[i] and segments[i] not in PATH_ACTIONS:
+            segments[i] = "{id}"
+    return "/".join(segments)
+
+def instrument_tool(fn):
+    """
+    Wraps a tool so its latency is recorded, keeping its signature and docstring for FastMCP
+    """
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await fn(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            TOOL_DURATION.observe(elapsed, name, outcome)
+            if LOG_SPANS:
+                logger.info("tool=%s outcome=%s duration_ms=%.1f", name, outcome, elapsed * 1000)
+    return wrapper
+
+# Served next to /mcp and /auth in http mode
+async def metrics_endpoint(request):
+    from starlette.responses import Response
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -1,27 +1,39 @@
+import asyncio
+from contextlib import asynccontextmanager
+import heapq
+import logging
 import os
+import time
 import uuid
 import threading
+from urllib.parse import urlencode
 
 import httpx
-from starlette.responses import PlainTextResponse
-from starlette.exceptions import HTTPException
-from starlette.routing import Route, Router, Mount
-from starlette.applications import Starlette
-import uvicorn
+
+from id_token import IdTokenVerifier
+from metrics import LOGINS, SESSIONS, SESSIONS_REMOVED, TOKEN_REFRESHES
+from sessions import Session, create_session_store
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Background refresh fires this many seconds before an access token expires
+TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", "300"))
+# Sessions unused for longer are left to refresh inline on their next call rather than kept warm
+TOKEN_REFRESH_IDLE = int(os.getenv("TOKEN_REFRESH_IDLE", str(2 * 3600)))
+# Tokens this close to expiry are refreshed inline instead of being handed out
+TOKEN_EXPIRY_SKEW = 30
+CALLBACK_SERVER_START_TIMEOUT = 5
 
 class OAuth:
     def __init__(self):
-        self.routes = [
-            Route("/callback", endpoint=self.callback),
-        ]
-
         self.REDIRECT_URI = f"{os.getenv("DOMAIN")}/auth/callback"
         self.CLIENT_ID = os.getenv("CLIENT_ID")
         self.CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 
-        self.AUTH_URL = "https://accounts.google.com/o/oauth2/auth"
-        self.TOKEN_URL = "https://oauth2.googleapis.com/token"
-        self.USERINFO_URL = "https://www.googleapis.com/oauth2/v3/userinfo"
+        # Overridable to point logins at a stand-in server, see bench/fake_google.py
+        self.AUTH_URL = os.getenv("AUTH_URL", "https://accounts.google.com/o/oauth2/auth")
+        self.TOKEN_URL = os.getenv("TOKEN_URL", "https://oauth2.googleapis.com/token")
 
         self.REQUIRED_SCOPES = [
             "https://www.googleapis.com/auth/userinfo.profile",
@@ -30,60 +42,157 @@ class OAuth:
             "openid",
         ]
 
-        self.sessions = {}
+        self.sessions = create_session_store()
+        SESSIONS.set_function(self._session_counts)
+        SESSIONS_REMOVED.set_function(self._sessions_removed)
 
-    # For stdio mode
-    def run(self):
-        def run_server(app):
+        self._get_client = None
+        self.id_tokens = IdTokenVerifier(lambda: self.client, self.CLIENT_ID)
+        self._refreshes = SingleFlight()
+        self._refresh_heap = []
+        self._refresh_lock = threading.Lock()
+        self._refresh_wakeup = None
+        self._background_tasks = set()
+        self._loop = None
+
+        self.server_thread = None
+        self._serve_callback = False
+        self._callback_server_lock = asyncio.Lock()
+
+    # Runs the proactive token refresher on the current event loop, refreshing through the shared client
+    @asynccontextmanager
+    async def lifespan(self, get_client):
+        self._get_client = get_client
+        self._loop = asyncio.get_running_loop()
+        self._refresh_wakeup = asyncio.Event()
+        task = asyncio.create_task(self._refresh_loop())
+        try:
+            yield
+        finally:
+            task.cancel()
             try:
-                uvicorn.run(app, host="127.0.0.1", port=5000, log_level="error", access_log=False)
-            except:
-                os._exit(1)
-        self.app = Starlette(debug=True, routes=[Mount('/auth', routes=self.routes)])
-        self.server_thread = threading.Thread(
-            target=run_server,
-            args=(self.app,),
-            daemon=True,
-        )
-        self.server_thread.start()
+                await task
+            except asyncio.CancelledError:
+                pass
+            self._loop = None
+            self._get_client = None
+
+    # Read at scrape time by /metrics
+    def _session_counts(self):
+        stats = self.sessions.stats()
+        return {("authenticated",): stats["sessions"], ("pending",): stats["pending"]}
+
+    def _sessions_removed(self):
+        stats = self.sessions.stats()
+        return {(reason,): stats[reason] for reason in ("pending_expired", "idle_evicted", "capacity_evicted")}
+
+    @property
+    def client(self):
+        return self._get_client()
+
+    # Web frameworks are imported here rather than at module level to keep stdio startup fast
+    @property
+    def routes(self):
+        from starlette.routing import Route
+        return [
+            Route("/callback", endpoint=self.callback),
+        ]
+
+    # For stdio mode, the callback server is only started once a login url is handed out
+    def run(self):
+        self._serve_callback = True
+
+    async def ensure_callback_server(self):
+        if not self._serve_callback:
+            return
+        async with self._callback_server_lock:
+            if self.server_thread is not None and self.server_thread.is_alive():
+                return
+            from starlette.applications import Starlette
+            from starlette.routing import Mount
+            import uvicorn
+
+            self.app = Starlette(debug=True, routes=[Mount('/auth', routes=self.routes)])
+            server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=5000, log_level="error", access_log=False))
+
+            def run_server():
+                try:
+                    server.run()
+                except BaseException:
+                    # uvicorn exits when the port is taken, which must not take the MCP down with it
+                    logger.exception("Login callback server stopped")
+
+            self.server_thread = threading.Thread(target=run_server, daemon=True)
+            self.server_thread.start()
+            deadline = time.monotonic() + CALLBACK_SERVER_START_TIMEOUT
+            while not server.started and self.server_thread.is_alive() and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            if not server.started:
+                self.server_thread = None
+                raise RuntimeError("Could not start the login callback server on port 5000")
 
     # For http mode
     def get_asgi_app(self):
+        from starlette.routing import Router
         return Router(routes=self.routes)
 
     async def callback(self, request):
+        from starlette.responses import PlainTextResponse
+        import jwt
         if "code" not in request.query_params or "state" not in request.query_params:
             return PlainTextResponse("Query params missing key 'code' or 'state'", status_code=404)
         code = request.query_params["code"]
         session_id = request.query_params["state"]
+        if not self.sessions.is_pending(session_id):
+            return PlainTextResponse("Login link has expired, please request a new one", status_code=400)
+
+        try:
+            session = await self._on_mcp_loop(self._exchange_code(code))
+        except httpx.HTTPError:
+            LOGINS.inc("token_error")
+            return PlainTextResponse("Request for access token failed", status_code=500)
+        except jwt.InvalidTokenError:
+            LOGINS.inc("invalid_id_token")
+            logger.warning("Rejected id_token for session %s", session_id, exc_info=True)
+            return PlainTextResponse("Could not verify the Google sign in", status_code=400)
+        if not self.sessions.authenticate(session_id, session):
+            LOGINS.inc("expired")
+            return PlainTextResponse("Login link has expired, please request a new one", status_code=400)
+        LOGINS.inc("ok")
+        self._schedule_refresh(session_id, session.expires_at)
+        return PlainTextResponse("Success")
 
-        # Exchange authorization code for tokens
-        token_data = {
+    # The stdio callback server runs its own event loop on another thread,
+    # upstream calls are handed to the MCP's loop where the shared client lives
+    async def _on_mcp_loop(self, coro):
+        if self._loop is None or self._loop is asyncio.get_running_loop():
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    # Identity comes from the id_token verified locally, saving a userinfo round trip
+    async def _exchange_code(self, code):
+        res = await self.client.post(self.TOKEN_URL, data={
             "code": code,
             "client_id": self.CLIENT_ID,
             "client_secret": self.CLIENT_SECRET,
             "redirect_uri": self.REDIRECT_URI,
             "grant_type": "authorization_code",
-        }
-        with httpx.Client() as client:
-            token_resp = client.post(self.TOKEN_URL, data=token_data)
-            if not token_resp.is_success:
-                return PlainTextResponse("Request for access token failed", status_code=500)
-            access_token = token_resp.json()["access_token"]
-
-            user_resp = client.get(self.USERINFO_URL, headers={
-                "Authorization": f"Bearer {access_token}"
-            })
-            if not user_resp.is_success:
-                return PlainTextResponse("Request for user info failed", status_code=500)
-        user_info = user_resp.json()
-        user_info["access_token"] = access_token
-        self.sessions[session_id] = user_info
-        return PlainTextResponse("Success")
-    
+        })
+        res.raise_for_status()
+        token_json = res.json()
+        claims = await self.id_tokens.verify(token_json.get("id_token"))
+        return Session(
+            sub=claims["sub"],
+            email=claims.get("email"),
+            name=claims.get("name"),
+            access_token=token_json["access_token"],
+            refresh_token=token_json.get("refresh_token"),
+            expires_at=time.time() + token_json.get("expires_in", 3600),
+        )
+
     def get_url_and_session(self):
-        session_id = uuid.uuid4()
-        self.sessions[session_id] = None
+        session_id = str(uuid.uuid4())
+        self.sessions.add_pending(session_id)
 
         auth_params = {
             "client_id": self.CLIENT_ID,
@@ -94,10 +203,80 @@ class OAuth:
             "prompt": "consent",
             "state": session_id,
         }
-        url = httpx.URL(self.AUTH_URL).copy_merge_params(auth_params)
+        url = f"{self.AUTH_URL}?{urlencode(auth_params)}"
         return url, session_id
     
-    def get_access_token(self, session_id):
-        if session_id not in self.sessions:
+    # touch is False for background work, which must not count as use of the session
+    async def get_access_token(self, session_id, touch=True):
+        session = self.sessions.get(session_id) if touch else self.sessions.peek(session_id)
+        if session is None:
             return None
-        return self.sessions[session_id]["access_token"]
+        if session.refresh_token and session.expires_at - time.time() < TOKEN_EXPIRY_SKEW:
+            await self.refresh(session_id)
+        return session.access_token
+
+    # Concurrent callers for the same session share one token request
+    async def refresh(self, session_id):
+        await self._refreshes.do(session_id, lambda: self._refresh(session_id))
+
+    async def _refresh(self, session_id):
+        session = self.sessions.peek(session_id)
+        if session is None or not session.refresh_token:
+            return
+        try:
+            res = await self.client.post(self.TOKEN_URL, data={
+                "client_id": self.CLIENT_ID,
+                "client_secret": self.CLIENT_SECRET,
+                "refresh_token": session.refresh_token,
+                "grant_type": "refresh_token",
+            })
+            res.raise_for_status()
+        except httpx.HTTPError:
+            TOKEN_REFRESHES.inc("error")
+            raise
+        TOKEN_REFRESHES.inc("ok")
+        token_json = res.json()
+        session.access_token = token_json["access_token"]
+        session.expires_at = time.time() + token_json.get("expires_in", 3600)
+        # Google may rotate the refresh token
+        if "refresh_token" in token_json:
+            session.refresh_token = token_json["refresh_token"]
+        self.sessions.save(session_id, session)
+        self._schedule_refresh(session_id, session.expires_at)
+
+    # Safe to call from the stdio callback server thread
+    def _schedule_refresh(self, session_id, expires_at):
+        with self._refresh_lock:
+            heapq.heappush(self._refresh_heap, (expires_at - TOKEN_REFRESH_MARGIN, expires_at, session_id))
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._refresh_wakeup.set)
+
+    async def _refresh_loop(self):
+        while True:
+            self._refresh_wakeup.clear()
+            with self._refresh_lock:
+                due = []
+                while self._refresh_heap and self._refresh_heap[0][0] <= time.time():
+                    due.append(heapq.heappop(self._refresh_heap))
+                delay = self._refresh_heap[0][0] - time.time() if self._refresh_heap else None
+            for _, expires_at, session_id in due:
+                session = self.sessions.peek(session_id)
+                # Skip evicted or idle sessions and entries superseded by a newer token
+                if (
+                    session is not None
+                    and session.expires_at == expires_at
+                    and time.time() - session.last_used < TOKEN_REFRESH_IDLE
+                ):
+                    task = asyncio.create_task(self._background_refresh(session_id))
+                    self._background_tasks.add(task)
+                    task.add_done_callback(self._background_tasks.discard)
+            try:
+                await asyncio.wait_for(self._refresh_wakeup.wait(), timeout=delay)
+            except TimeoutError:
+                pass
+
+    async def _background_refresh(self, session_id):
+        try:
+            await self.refresh(session_id)
+        except httpx.HTTPError:
+            logger.warning("Background token refresh failed for session %s", session_id, exc_info=True)
@@ -0,0 +1,43 @@
+from collections import OrderedDict
+import os
+
+OWNERSHIP_INDEX_MAX = int(os.getenv("OWNERSHIP_INDEX_MAX", "10000"))
+
+# Private extended property set on every event created through the MCP
+MCP_PROPERTY = "calendarMcp"
+
+def mark_owned(event_json):
+    event_json.setdefault("extendedProperties", {}).setdefault("private", {})[MCP_PROPERTY] = "true"
+    return event_json
+
+def has_owned_marker(event):
+    return event.get("extendedProperties", {}).get("private", {}).get(MCP_PROPERTY) == "true"
+
+class OwnershipIndex:
+    """
+    Ids of calendars and events known to be MCP generated, with the last ETag seen for each
+    Lets mutations go out as If-Match requests without re-fetching the resource first
+    """
+    def __init__(self, max_entries=OWNERSHIP_INDEX_MAX):
+        self.max_entries = max_entries
+        self._etags = OrderedDict()
+
+    def __len__(self):
+        return len(self._etags)
+
+    def get(self, key):
+        etag = self._etags.get(key)
+        if etag is not None:
+            self._etags.move_to_end(key)
+        return etag
+
+    def put(self, key, etag):
+        if not etag:
+            return
+        self._etags[key] = etag
+        self._etags.move_to_end(key)
+        while len(self._etags) > self.max_entries:
+            self._etags.popitem(last=False)
+
+    def discard(self, key):
+        self._etags.pop(key, None)
@@ -0,0 +1,151 @@
+import asyncio
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+import logging
+import os
+import random
+import time
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Google's default Calendar quota is 600 queries per minute per user
+USER_QPS = float(os.getenv("RATE_LIMIT_USER_QPS", "10"))
+USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "20"))
+PROJECT_QPS = float(os.getenv("RATE_LIMIT_PROJECT_QPS", "100"))
+PROJECT_BURST = float(os.getenv("RATE_LIMIT_PROJECT_BURST", "200"))
+MAX_IN_FLIGHT_PER_SESSION = int(os.getenv("MAX_IN_FLIGHT_PER_SESSION", "8"))
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "5"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 32
+# Bounds the per-user and per-session state kept by the scheduler
+MAX_TRACKED_KEYS = 10000
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "PATCH"}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+RETRYABLE_STATUS = {500, 502, 503, 504}
+
+# Also applied to the parts of a batch response, which Google throttles one by one
+def is_rate_limited(status, body_json):
+    if status == 429:
+        return True
+    if status != 403 or not isinstance(body_json, dict):
+        return False
+    errors = body_json.get("error", {}).get("errors", [])
+    return any(error.get("reason") in RATE_LIMIT_REASONS for error in errors)
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+
+    async def acquire(self, cost=1):
+        # Requests costing more than the bucket holds wait for a full bucket instead of forever
+        cost = min(cost, self.capacity)
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if now >= self.paused_until and self.tokens >= cost:
+                self.tokens -= cost
+                return
+            wait = max(self.paused_until - now, (cost - self.tokens) / self.rate)
+            await asyncio.sleep(wait)
+
+    # Holds every caller back, used when Google reports the quota behind this bucket is exhausted
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class RequestScheduler:
+    """
+    Paces outbound Google API calls through per-user and per-project token buckets,
+    caps concurrent requests per session and retries throttled or failed calls with
+    exponential backoff and jitter, honoring Retry-After
+    """
+    def __init__(self):
+        self.project_bucket = TokenBucket(PROJECT_QPS, PROJECT_BURST)
+        self._user_buckets = OrderedDict()
+        self._session_slots = OrderedDict()
+        self.retries = 0
+        self.throttled = 0
+
+    async def send(self, user_key, session_id, send, idempotent, cost=1):
+        bucket = self._tracked(self._user_buckets, user_key, lambda: TokenBucket(USER_QPS, USER_BURST))
+        slots = self._tracked(self._session_slots, session_id, lambda: asyncio.Semaphore(MAX_IN_FLIGHT_PER_SESSION))
+        attempt = 0
+        while True:
+            await bucket.acquire(cost)
+            await self.project_bucket.acquire(cost)
+            async with slots:
+                try:
+                    res = await send()
+                except httpx.TransportError as e:
+                    # A request that never connected is safe to resend whatever the method
+                    if attempt >= MAX_RETRIES or not (idempotent or isinstance(e, httpx.ConnectError)):
+                        raise
+                    delay = self._backoff(attempt)
+                else:
+                    rate_limited = self._is_rate_limited(res)
+                    if rate_limited:
+                        self.throttled += 1
+                    # Throttled requests were not applied, so they can be retried even when not idempotent
+                    if attempt >= MAX_RETRIES or not (rate_limited or (idempotent and res.status_code in RETRYABLE_STATUS)):
+                        return res
+                    delay = self._retry_after(res)
+                    if delay is None:
+                        delay = self._backoff(attempt)
+                    if rate_limited:
+                        bucket.pause(delay)
+                    await res.aclose()
+            attempt += 1
+            self.retries += 1
+            logger.debug("Retrying Google API call for %s in %.2fs (attempt %d)", user_key, delay, attempt)
+            await asyncio.sleep(delay)
+
+    # A batch can succeed while some of its parts were throttled, the caller resends those parts
+    # once this has held back the user's requests for the attempt's backoff
+    def pause_user(self, user_key, attempt):
+        bucket = self._tracked(self._user_buckets, user_key, lambda: TokenBucket(USER_QPS, USER_BURST))
+        bucket.pause(self._backoff(attempt))
+        self.throttled += 1
+        self.retries += 1
+
+    def _tracked(self, table, key, factory):
+        value = table.get(key)
+        if value is None:
+            value = table[key] = factory()
+            if len(table) > MAX_TRACKED_KEYS:
+                table.popitem(last=False)
+        else:
+            table.move_to_end(key)
+        return value
+
+    def _is_rate_limited(self, res):
+        if res.status_code not in (403, 429):
+            return False
+        try:
+            body_json = res.json()
+        except ValueError:
+            body_json = None
+        return is_rate_limited(res.status_code, body_json)
+
+    def _retry_after(self, res):
+        value = res.headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            return None
+
+    def _backoff(self, attempt):
+        # Full jitter keeps retrying clients from synchronising
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
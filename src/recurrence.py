@@ -0,0 +1,142 @@
+from calendar import monthrange
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+# Expansion stops here for rules without UNTIL or COUNT, or runaway rules
+MAX_OCCURRENCES = 1000
+
+def parse_rrule(line):
+    rule = {}
+    for part in line.removeprefix("RRULE:").split(";"):
+        key, _, value = part.partition("=")
+        if key:
+            rule[key.upper()] = value
+    if rule.get("FREQ") not in ("DAILY", "WEEKLY", "MONTHLY", "YEARLY"):
+        raise ValueError(f"Unsupported recurrence frequency {rule.get("FREQ")!r}")
+    return rule
+
+def _parse_ical_time(value, tz):
+    if value.endswith("Z"):
+        return datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+    if "T" in value:
+        return datetime.strptime(value, "%Y%m%dT%H%M%S").replace(tzinfo=tz)
+    # A bare date bound includes the whole day
+    return datetime.strptime(value, "%Y%m%d").replace(tzinfo=tz) + timedelta(days=1) - timedelta(microseconds=1)
+
+def _parse_exdates(line, tz):
+    params, _, values = line.partition(":")
+    for param in params.split(";")[1:]:
+        key, _, value = param.partition("=")
+        if key.upper() == "TZID":
+            tz = ZoneInfo(value)
+    return {_parse_ical_time(value, tz) for value in values.split(",") if value}
+
+def _byday(value):
+    # Entries like TU, 2TU or -1FR, as (ordinal or None, weekday index)
+    days = []
+    for entry in value.split(","):
+        entry = entry.strip().upper()
+        ordinal = entry[:-2]
+        days.append((int(ordinal) if ordinal else None, WEEKDAYS.index(entry[-2:])))
+    return days
+
+def _weekly(start, rule, interval):
+    week_start = WEEKDAYS.index(rule.get("WKST", "MO"))
+    days = sorted({day for _, day in _byday(rule["BYDAY"])} if "BYDAY" in rule else {start.weekday()})
+    # Offsets of each occurrence from the start of its week in week order (SU comes first with WKST=SU),
+    # applied to every week at once
+    offsets = sorted(timedelta(days=(day - week_start) % 7) for day in days)
+    week = start - timedelta(days=(start.weekday() - week_start) % 7)
+    step = timedelta(weeks=interval)
+    while True:
+        for offset in offsets:
+            yield week + offset
+        week += step
+
+def _month_days(year, month, rule, start):
+    last = monthrange(year, month)[1]
+    if "BYMONTHDAY" in rule:
+        days = []
+        for value in rule["BYMONTHDAY"].split(","):
+            day = int(value)
+            day = day if day > 0 else last + day + 1
+            if 1 <= day <= last:
+                days.append(day)
+        return sorted(days)
+    if "BYDAY" in rule:
+        days = set()
+        for ordinal, weekday in _byday(rule["BYDAY"]):
+            first = (weekday - datetime(year, month, 1).weekday()) % 7 + 1
+            matches = list(range(first, last + 1, 7))
+            if ordinal is None:
+                days.update(matches)
+            elif -len(matches) <= ordinal <= len(matches) and ordinal != 0:
+                days.add(matches[ordinal - 1 if ordinal > 0 else ordinal])
+        return sorted(days)
+    return [start.day] if start.day <= last else []
+
+def _monthly(start, rule, interval):
+    year, month = start.year, start.month
+    # Bounded so rules that never match (BYMONTHDAY=31 every 2nd February...) still terminate
+    for _ in range(MAX_OCCURRENCES * 12):
+        for day in _month_days(year, month, rule, start):
+            yield start.replace(year=year, month=month, day=day)
+        month += interval
+        year += (month - 1) // 12
+        month = (month - 1) % 12 + 1
+
+def _yearly(start, interval):
+    year = start.year
+    for _ in range(MAX_OCCURRENCES * 4):
+        # Skips Feb 29 in non leap years like Google Calendar does
+        if start.day <= monthrange(year, start.month)[1]:
+            yield start.replace(year=year)
+        year += interval
+
+def expand(start, end, recurrence, horizon):
+    """
+    Occurrences of an event as sorted (start, end) pairs of aware datetimes
+    start and end are naive local times of the first occurrence in tz (taken from horizon's tzinfo if absent),
+    recurrence is the event's RRULE/EXDATE lines, expansion stops at horizon
+    """
+    tz = start.tzinfo or horizon.tzinfo
+    start = start.replace(tzinfo=None)
+    duration = end.replace(tzinfo=None) - start
+    rule = None
+    exdates = set()
+    for line in recurrence or []:
+        if line.startswith("RRULE:"):
+            rule = parse_rrule(line)
+        elif line.startswith("EXDATE"):
+            exdates |= _parse_exdates(line, tz)
+    if rule is None:
+        first = start.replace(tzinfo=tz)
+        return [(first, first + duration)]
+
+    interval = int(rule.get("INTERVAL", "1"))
+    count = int(rule["COUNT"]) if "COUNT" in rule else None
+    until = _parse_ical_time(rule["UNTIL"], tz) if "UNTIL" in rule else None
+    if rule["FREQ"] == "DAILY":
+        candidates = (start + timedelta(days=i * interval) for i in range(MAX_OCCURRENCES))
+    elif rule["FREQ"] == "WEEKLY":
+        candidates = _weekly(start, rule, interval)
+    elif rule["FREQ"] == "MONTHLY":
+        candidates = _monthly(start, rule, interval)
+    else:
+        candidates = _yearly(start, interval)
+
+    occurrences = []
+    generated = 0
+    for candidate in candidates:
+        if candidate < start:
+            continue
+        local = candidate.replace(tzinfo=tz)
+        if (until is not None and local > until) or local > horizon:
+            break
+        generated += 1
+        if local not in exdates:
+            occurrences.append((local, local + duration))
+        if (count is not None and generated >= count) or generated >= MAX_OCCURRENCES:
+            break
+    return occurrences
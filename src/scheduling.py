@@ -0,0 +1,66 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+def parse_rfc3339(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def merge_intervals(intervals):
+    """
+    Sort-and-sweep merge of (start, end) pairs into disjoint, sorted intervals
+    Touching intervals are merged as well
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+def free_slots(busy, window_start, window_end, duration, tz, work_start, work_end, work_days, limit):
+    """
+    Earliest gaps of at least duration between merged busy intervals, restricted to working hours
+    busy must be the output of merge_intervals, window bounds are aware datetimes
+    Yields (slot_start, gap_end) in tz
+    """
+    busy_starts = [start for start, _ in busy]
+    found = 0
+    day = window_start.astimezone(tz).date()
+    last_day = window_end.astimezone(tz).date()
+    while day <= last_day and found < limit:
+        if WEEKDAYS[day.weekday()] in work_days:
+            day_start = max(window_start, datetime.combine(day, work_start, tz))
+            day_end = min(window_end, datetime.combine(day, work_end, tz))
+            # Start from the last busy interval beginning at or before the day starts
+            i = max(bisect_right(busy_starts, day_start) - 1, 0)
+            cursor = day_start
+            while cursor < day_end and found < limit:
+                while i < len(busy) and busy[i][1] <= cursor:
+                    i += 1
+                if i < len(busy) and busy[i][0] <= cursor:
+                    cursor = busy[i][1]
+                    continue
+                gap_end = min(busy[i][0], day_end) if i < len(busy) else day_end
+                if gap_end - cursor >= duration:
+                    yield cursor.astimezone(tz), gap_end.astimezone(tz)
+                    found += 1
+                cursor = gap_end
+        day += timedelta(days=1)
+
+def find_conflicts(occurrences, busy):
+    """
+    Pairs of (occurrence, busy interval) that overlap
+    occurrences are sorted (start, end) pairs, busy must be the output of merge_intervals
+    so its ends are sorted as well and each occurrence needs one bisect
+    """
+    busy_ends = [end for _, end in busy]
+    conflicts = []
+    for start, end in occurrences:
+        i = bisect_right(busy_ends, start)
+        while i < len(busy) and busy[i][0] < end:
+            conflicts.append(((start, end), busy[i]))
+            i += 1
+    return conflicts
@@ -0,0 +1,138 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+import re
+from zoneinfo import ZoneInfo
+
+from recurrence import expand
+
+TOKEN_PATTERN = re.compile(r"\w+")
+INDEXED_FIELDS = ("summary", "description", "location")
+# Recurring events matched without an upper time bound are expanded this far past the lower one
+OPEN_RANGE_HORIZON = timedelta(days=366)
+
+def tokenize(text):
+    return set(TOKEN_PATTERN.findall(text.casefold()))
+
+def _bounds(event):
+    # (start, end, tz) of the first occurrence, all-day events are taken as UTC days
+    start, end = event.get("start", {}), event.get("end", {})
+    tz = ZoneInfo(start["timeZone"]) if "timeZone" in start else timezone.utc
+    if "dateTime" in start:
+        parse = lambda value: datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00")).astimezone(tz)
+    elif "date" in start:
+        parse = lambda value: datetime.fromisoformat(value["date"]).replace(tzinfo=tz)
+    else:
+        return None
+    return parse(start), parse(end), tz
+
+class EventIndex:
+    """
+    Inverted index over the text of one calendar's events, with event starts kept sorted
+    so time ranges are answered by bisection
+    Recurring events are kept aside and expanded only when they match a query
+    """
+    def __init__(self, events=()):
+        self.postings = {}
+        self.terms = {}
+        self.spans = {}
+        self.starts = []
+        self.recurring = {}
+        # Upper bound on event length, lets a range query bisect on start alone
+        self.max_duration = 0
+        for event in events:
+            self._add(event)
+        self.starts.sort()
+
+    def __len__(self):
+        return len(self.terms)
+
+    def add(self, event):
+        self.remove(event["id"])
+        span = self._add(event)
+        if span is not None and event["id"] not in self.recurring:
+            # The entry was appended unsorted, move it into place
+            item = self.starts.pop()
+            self.starts.insert(bisect_left(self.starts, item), item)
+
+    def _add(self, event):
+        event_id = event["id"]
+        terms = tokenize(" ".join(event.get(field) or "" for field in INDEXED_FIELDS))
+        self.terms[event_id] = terms
+        for term in terms:
+            self.postings.setdefault(term, set()).add(event_id)
+        bounds = _bounds(event)
+        if bounds is None:
+            return None
+        start, end, tz = bounds
+        span = (start.timestamp(), end.timestamp())
+        self.spans[event_id] = span
+        if event.get("recurrence"):
+            self.recurring[event_id] = (start.replace(tzinfo=None), end.replace(tzinfo=None), tz, event["recurrence"])
+        else:
+            self.starts.append((span[0], event_id))
+            self.max_duration = max(self.max_duration, span[1] - span[0])
+        return span
+
+    def remove(self, event_id):
+        terms = self.terms.pop(event_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            ids = self.postings[term]
+            ids.discard(event_id)
+            if not ids:
+                del self.postings[term]
+        span = self.spans.pop(event_id, None)
+        if self.recurring.pop(event_id, None) is None and span is not None:
+            i = bisect_left(self.starts, (span[0], event_id))
+            if i < len(self.starts) and self.starts[i] == (span[0], event_id):
+                del self.starts[i]
+
+    def search(self, terms, window_start=None, window_end=None):
+        """
+        Events containing every term and overlapping the window (either bound optional)
+        Returns (start timestamp, event_id) pairs, the start being that of the first occurrence in the window
+        """
+        low = window_start.timestamp() if window_start else float("-inf")
+        high = window_end.timestamp() if window_end else float("inf")
+        if terms:
+            # Intersect from the rarest term so the work is bounded by the smallest posting list
+            postings = sorted((self.postings.get(term, ()) for term in terms), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            matches = [(self.spans[event_id][0], event_id) for event_id in candidates
+                       if event_id in self.spans and event_id not in self.recurring and self._overlaps(event_id, low, high)]
+            # Events without times only match when no window is given
+            if window_start is None and window_end is None:
+                matches.extend((float("-inf"), event_id) for event_id in candidates if event_id not in self.spans)
+            recurring = [event_id for event_id in candidates if event_id in self.recurring]
+        else:
+            begin = bisect_left(self.starts, (low - self.max_duration,)) if window_start else 0
+            end = bisect_left(self.starts, (high,)) if window_end else len(self.starts)
+            matches = [(start, event_id) for start, event_id in self.starts[begin:end] if self._overlaps(event_id, low, high)]
+            recurring = list(self.recurring)
+        for event_id in recurring:
+            start = self._first_occurrence(event_id, window_start, window_end, low, high)
+            if start is not None:
+                matches.append((start, event_id))
+        return matches
+
+    def _overlaps(self, event_id, low, high):
+        start, end = self.spans[event_id]
+        return start < high and end > low
+
+    def _first_occurrence(self, event_id, window_start, window_end, low, high):
+        if self.spans[event_id][0] >= high:
+            return None
+        start, end, tz, recurrence = self.recurring[event_id]
+        if window_end is None and window_start is None:
+            return self.spans[event_id][0]
+        horizon = window_end or window_start + OPEN_RANGE_HORIZON
+        try:
+            occurrences = expand(start, end, recurrence, horizon.astimezone(tz))
+        except ValueError:
+            # Rules the expander does not support are matched on their first occurrence
+            return self.spans[event_id][0] if self._overlaps(event_id, low, high) else None
+        for occurrence_start, occurrence_end in occurrences:
+            if occurrence_start.timestamp() < high and occurrence_end.timestamp() > low:
+                return occurrence_start.timestamp()
+        return None
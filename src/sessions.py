@@ -0,0 +1,175 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import os
+import threading
+import time
+
+# Login links not completed within this many seconds are dropped
+PENDING_SESSION_TTL = int(os.getenv("PENDING_SESSION_TTL", "600"))
+# Authenticated sessions unused for this many seconds are dropped
+SESSION_IDLE_TTL = int(os.getenv("SESSION_IDLE_TTL", str(7 * 24 * 3600)))
+# Caps authenticated sessions and, separately, logins still in progress
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "10000"))
+# memory (single process) or sqlite (shared between workers)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+# Kept out of the code directory, which the server cannot write to in the Docker image
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join("data", "sessions.db"))
+
+class Session:
+    __slots__ = ("sub", "email", "name", "access_token", "refresh_token", "expires_at", "last_used")
+
+    def __init__(self, sub, email, name, access_token, refresh_token, expires_at):
+        self.sub = sub
+        self.email = email
+        self.name = name
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        self.last_used = time.time()
+
+class SessionBackend(ABC):
+    """
+    Pending logins and authenticated sessions, keyed by session id
+    Pending entries expire after pending_ttl, sessions are evicted after idle_ttl without use
+    or least recently used first once there are more than max_sessions
+    Implementations must be thread safe since the stdio callback server runs on its own thread
+    """
+    def __init__(self, pending_ttl=PENDING_SESSION_TTL, idle_ttl=SESSION_IDLE_TTL, max_sessions=MAX_SESSIONS):
+        self.pending_ttl = pending_ttl
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+
+        self.pending_expired = 0
+        self.idle_evicted = 0
+        self.capacity_evicted = 0
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+    @abstractmethod
+    def __len__(self): ...
+
+    @property
+    @abstractmethod
+    def pending_count(self): ...
+
+    @abstractmethod
+    def add_pending(self, session_id): ...
+
+    @abstractmethod
+    def is_pending(self, session_id): ...
+
+    # Promotes a pending login to a session, False if the login was not pending (or expired)
+    @abstractmethod
+    def authenticate(self, session_id, session): ...
+
+    # Looks up a session and counts it as used
+    @abstractmethod
+    def get(self, session_id): ...
+
+    # Looks up a session without counting it as used, for background work
+    @abstractmethod
+    def peek(self, session_id): ...
+
+    # Persists changes made to a session, such as refreshed tokens
+    @abstractmethod
+    def save(self, session_id, session): ...
+
+    @abstractmethod
+    def remove(self, session_id): ...
+
+    def stats(self):
+        return {
+            "sessions": len(self),
+            "pending": self.pending_count,
+            "pending_expired": self.pending_expired,
+            "idle_evicted": self.idle_evicted,
+            "capacity_evicted": self.capacity_evicted,
+        }
+
+class SessionStore(SessionBackend):
+    """
+    In-process session backend, only usable with a single worker
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._pending = OrderedDict()
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    def add_pending(self, session_id):
+        with self._lock:
+            self._pending[session_id] = time.time()
+            self._sweep()
+            # Unfinished logins are capped too, so a flood of them cannot grow the store without bound
+            while len(self._pending) > self.max_sessions:
+                self._pending.popitem(last=False)
+                self.capacity_evicted += 1
+
+    def is_pending(self, session_id):
+        with self._lock:
+            self._sweep()
+            return session_id in self._pending
+
+    def authenticate(self, session_id, session):
+        with self._lock:
+            self._sweep()
+            if self._pending.pop(session_id, None) is None:
+                return False
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.capacity_evicted += 1
+            return True
+
+    def get(self, session_id):
+        with self._lock:
+            self._sweep()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.time()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def peek(self, session_id):
+        return self._sessions.get(session_id)
+
+    # Sessions are held by reference, so there is nothing to write back
+    def save(self, session_id, session):
+        pass
+
+    def remove(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._pending.pop(session_id, None)
+
+    # Both maps are ordered oldest first, so expiry only ever looks at the front
+    def _sweep(self):
+        now = time.time()
+        while self._pending:
+            session_id, created_at = next(iter(self._pending.items()))
+            if now - created_at < self.pending_ttl:
+                break
+            del self._pending[session_id]
+            self.pending_expired += 1
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used < self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            self.idle_evicted += 1
+
+def create_session_store():
+    if SESSION_BACKEND == "sqlite":
+        from sqlite_sessions import SqliteSessionStore
+        return SqliteSessionStore(SESSION_DB_PATH)
+    if SESSION_BACKEND == "memory":
+        return SessionStore()
+    raise ValueError(f"Unknown SESSION_BACKEND {SESSION_BACKEND!r}, expected 'memory' or 'sqlite'")
@@ -0,0 +1,168 @@
+from collections import OrderedDict
+import os
+import sqlite3
+import threading
+import time
+
+from sessions import Session, SessionBackend
+
+# Seconds a session read from the database is reused before being read again,
+# bounds how long a token refreshed by another worker can go unseen
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "5"))
+# last_used is only written back when it is at least this many seconds stale
+TOUCH_INTERVAL = 60
+SWEEP_INTERVAL = 30
+
+SESSION_COLUMNS = ("sub", "email", "name", "access_token", "refresh_token", "expires_at", "last_used")
+
+class SqliteSessionStore(SessionBackend):
+    """
+    Session backend in a local SQLite database (WAL mode) so several uvicorn workers share logins
+    Reads go through a small in-process cache
+    """
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS pending (session_id TEXT PRIMARY KEY, created_at REAL NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, sub TEXT NOT NULL, email TEXT, name TEXT, access_token TEXT NOT NULL, "
+            "refresh_token TEXT, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)")
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._last_sweep = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    @property
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def add_pending(self, session_id):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO pending VALUES (?, ?)", (session_id, time.time()))
+            self.capacity_evicted += self._conn.execute(
+                "DELETE FROM pending WHERE session_id IN "
+                "(SELECT session_id FROM pending ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            ).rowcount
+            self._sweep()
+
+    def is_pending(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM pending WHERE session_id = ? AND created_at > ?",
+                (session_id, time.time() - self.pending_ttl),
+            ).fetchone()
+            return row is not None
+
+    def authenticate(self, session_id, session):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = self._conn.execute(
+                    "DELETE FROM pending WHERE session_id = ? AND created_at > ?",
+                    (session_id, time.time() - self.pending_ttl),
+                ).rowcount
+                if deleted:
+                    self._write(session_id, session)
+                    self.capacity_evicted += self._conn.execute(
+                        "DELETE FROM sessions WHERE session_id IN "
+                        "(SELECT session_id FROM sessions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                        (self.max_sessions,),
+                    ).rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            if deleted:
+                self._cache_put(session_id, session)
+            return bool(deleted)
+
+    def get(self, session_id):
+        with self._lock:
+            self._sweep()
+            session = self._load(session_id)
+            if session is None:
+                return None
+            now = time.time()
+            if now - session.last_used >= TOUCH_INTERVAL:
+                self._conn.execute("UPDATE sessions SET last_used = ? WHERE session_id = ?", (now, session_id))
+            session.last_used = now
+            return session
+
+    def peek(self, session_id):
+        with self._lock:
+            return self._load(session_id)
+
+    def save(self, session_id, session):
+        with self._lock:
+            self._write(session_id, session)
+            self._cache_put(session_id, session)
+
+    def remove(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM pending WHERE session_id = ?", (session_id,))
+            self._cache.pop(session_id, None)
+
+    def _load(self, session_id):
+        cached = self._cache.get(session_id)
+        if cached is not None and time.time() - cached[1] < SESSION_CACHE_TTL:
+            return cached[0]
+        row = self._conn.execute(
+            f"SELECT {", ".join(SESSION_COLUMNS)} FROM sessions WHERE session_id = ? AND last_used > ?",
+            (session_id, time.time() - self.idle_ttl),
+        ).fetchone()
+        if row is None:
+            self._cache.pop(session_id, None)
+            return None
+        values = dict(zip(SESSION_COLUMNS, row))
+        last_used = values.pop("last_used")
+        if cached is not None:
+            # Update the cached object in place so callers holding it see refreshed tokens
+            session = cached[0]
+            for column, value in values.items():
+                setattr(session, column, value)
+        else:
+            session = Session(**values)
+        session.last_used = last_used
+        self._cache_put(session_id, session)
+        return session
+
+    def _write(self, session_id, session):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (session_id, *(getattr(session, column) for column in SESSION_COLUMNS)),
+        )
+
+    def _cache_put(self, session_id, session):
+        self._cache[session_id] = (session, time.time())
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.max_sessions:
+            self._cache.popitem(last=False)
+
+    def _sweep(self):
+        now = time.time()
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        self.pending_expired += self._conn.execute(
+            "DELETE FROM pending WHERE created_at <= ?", (now - self.pending_ttl,)
+        ).rowcount
+        self.idle_evicted += self._conn.execute(
+            "DELETE FROM sessions WHERE last_used <= ?", (now - self.idle_ttl,)
+        ).rowcount
+        for session_id, (session, _) in list(self._cache.items()):
+            if now - session.last_used >= self.idle_ttl:
+                del self._cache[session_id]
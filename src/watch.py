@@ -0,0 +1,92 @@
+import hashlib
+import hmac
+import os
+import time
+from urllib.parse import parse_qs, urlencode
+
+# Google posts change notifications here, it must be an https address Google can reach
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", f"{os.getenv("DOMAIN")}/webhook/calendar")
+# Signs channel tokens, the OAuth client secret is used when unset
+WATCH_SECRET = os.getenv("WATCH_SECRET")
+# Channel lifetime asked of Google, which may grant less
+WATCH_CHANNEL_TTL = int(os.getenv("WATCH_CHANNEL_TTL", str(7 * 24 * 3600)))
+# Channels are replaced this many seconds before they expire
+WATCH_RENEW_MARGIN = int(os.getenv("WATCH_RENEW_MARGIN", "3600"))
+WATCH_RENEW_CHECK_INTERVAL = 60
+
+class Channel:
+    __slots__ = ("id", "resource_id", "expires_at", "session_id")
+
+    def __init__(self, id, resource_id, expires_at, session_id):
+        self.id = id
+        self.resource_id = resource_id
+        self.expires_at = expires_at
+        self.session_id = session_id
+
+class WatchRegistry:
+    """
+    Push notification channels of watched (user, calendar_id) keys, and whether a notification
+    arrived since each was last synced. A calendar is clean while its channel is live and nothing
+    changed, reads of a clean calendar are served from the event cache without asking Google
+    Channel tokens are signed rather than stored, so any worker can tell a notification is genuine
+    """
+    def __init__(self, secret):
+        self._secret = (secret or "").encode()
+        self.channels = {}
+        # Off when notifications may land on another worker process than the one that reads
+        self.trust_clean = True
+        self._notified = {}
+        self._synced = {}
+
+    def _signature(self, channel_id, key):
+        message = "\n".join((channel_id, *key)).encode()
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def token(self, channel_id, key):
+        user, calendar_id = key
+        return urlencode({"u": user, "c": calendar_id, "s": self._signature(channel_id, key)})
+
+    # The key a notification is about, or None if its token was not issued for that channel
+    def verify(self, channel_id, token):
+        values = parse_qs(token or "")
+        try:
+            key = (values["u"][0], values["c"][0])
+            signature = values["s"][0]
+        except KeyError:
+            return None
+        if not hmac.compare_digest(signature, self._signature(channel_id or "", key)):
+            return None
+        return key
+
+    def put(self, key, channel):
+        previous = self.channels.get(key)
+        self.channels[key] = channel
+        return previous
+
+    def remove(self, key):
+        self._notified.pop(key, None)
+        self._synced.pop(key, None)
+        return self.channels.pop(key, None)
+
+    def due(self, before):
+        return [(key, channel) for key, channel in self.channels.items() if channel.expires_at <= before]
+
+    def notify(self, key):
+        self._notified[key] = self._notified.get(key, 0) + 1
+
+    # Taken before a sync starts, so a notification arriving during the sync still leaves the key dirty
+    def generation(self, key):
+        return self._notified.get(key, 0)
+
+    def mark_synced(self, key, generation):
+        if key in self.channels:
+            self._synced[key] = generation
+
+    def is_clean(self, key):
+        channel = self.channels.get(key)
+        return (
+            self.trust_clean
+            and channel is not None
+            and channel.expires_at > time.time()
+            and self._synced.get(key) == self._notified.get(key, 0)
+        )
@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+
+import ics
+
+STAMP = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def test_cancelled_occurrences_become_exdates():
+    event = {
+        "id": "weekly",
+        "iCalUID": "weekly@google.com",
+        "summary": "Standup",
+        "start": {"dateTime": "2026-01-05T09:00:00-05:00", "timeZone": "America/New_York"},
+        "end": {"dateTime": "2026-01-05T09:15:00-05:00", "timeZone": "America/New_York"},
+        "recurrence": ["RRULE:FREQ=WEEKLY;COUNT=4"],
+    }
+    cancelled = [{"dateTime": "2026-01-12T14:00:00Z", "timeZone": "America/New_York"}]
+    text = ics.format_event(event, STAMP, cancelled)
+    assert "EXDATE;TZID=America/New_York:20260112T090000\r\n" in text
+
+    [properties] = ics.iter_vevents(text.splitlines())
+    parsed = ics.vevent_to_event(properties)
+    assert parsed["recurrence"] == ["RRULE:FREQ=WEEKLY;COUNT=4", "EXDATE;TZID=America/New_York:20260112T090000"]
+
+def test_all_day_exdate_is_a_date():
+    event = {"id": "daily", "start": {"date": "2026-01-05"}, "end": {"date": "2026-01-06"}, "recurrence": ["RRULE:FREQ=DAILY"]}
+    assert "EXDATE;VALUE=DATE:20260107\r\n" in ics.format_event(event, STAMP, [{"date": "2026-01-07"}])
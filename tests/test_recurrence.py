@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+
+from recurrence import expand
+from scheduling import find_conflicts, merge_intervals
+
+UTC = timezone.utc
+
+def starts(occurrences):
+    return [start.strftime("%a %m-%d") for start, _ in occurrences]
+
+def test_weekly_sunday_first_week_is_in_order():
+    occurrences = expand(
+        datetime(2026, 1, 10, 9), datetime(2026, 1, 10, 10),
+        ["RRULE:FREQ=WEEKLY;UNTIL=20260124T000000Z;WKST=SU;BYDAY=SA,SU"],
+        datetime(2026, 12, 31, tzinfo=UTC),
+    )
+    assert starts(occurrences) == ["Sat 01-10", "Sun 01-11", "Sat 01-17", "Sun 01-18"]
+
+def test_weekly_first_occurrence_is_the_start():
+    occurrences = expand(
+        datetime(2026, 1, 11, 9), datetime(2026, 1, 11, 10),
+        ["RRULE:FREQ=WEEKLY;COUNT=4;WKST=SU;BYDAY=SU,SA"],
+        datetime(2026, 12, 31, tzinfo=UTC),
+    )
+    assert starts(occurrences) == ["Sun 01-11", "Sat 01-17", "Sun 01-18", "Sat 01-24"]
+    assert occurrences == sorted(occurrences)
+
+def test_weekly_exdate_and_interval():
+    occurrences = expand(
+        datetime(2026, 1, 5, 9), datetime(2026, 1, 5, 10),
+        ["RRULE:FREQ=WEEKLY;INTERVAL=2;COUNT=3;BYDAY=MO", "EXDATE:20260119T090000Z"],
+        datetime(2026, 12, 31, tzinfo=UTC),
+    )
+    assert starts(occurrences) == ["Mon 01-05", "Mon 02-02"]
+
+def test_find_conflicts_checks_every_occurrence():
+    occurrences = expand(
+        datetime(2026, 1, 11, 9), datetime(2026, 1, 11, 10),
+        ["RRULE:FREQ=WEEKLY;COUNT=4;WKST=SU;BYDAY=SU,SA"],
+        datetime(2026, 12, 31, tzinfo=UTC),
+    )
+    first_start = occurrences[0][0]
+    busy = merge_intervals([
+        (first_start + timedelta(minutes=30), first_start + timedelta(hours=2)),
+        (datetime(2026, 1, 20, 9, tzinfo=UTC), datetime(2026, 1, 20, 10, tzinfo=UTC)),
+    ])
+    conflicts = find_conflicts(occurrences, busy)
+    assert [occurrence for occurrence, _ in conflicts] == [occurrences[0]]
+
+def test_find_conflicts_touching_intervals_do_not_conflict():
+    start = datetime(2026, 1, 5, 9, tzinfo=UTC)
+    occurrences = [(start, start + timedelta(hours=1))]
+    busy = merge_intervals([(start + timedelta(hours=1), start + timedelta(hours=2)), (start - timedelta(hours=1), start)])
+    assert find_conflicts(occurrences, busy) == []
@@ -0,0 +1,19 @@
+import pytest
+
+from sessions import SessionStore
+from sqlite_sessions import SqliteSessionStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SqliteSessionStore(str(tmp_path / "sessions.db"), max_sessions=3)
+    return SessionStore(max_sessions=3)
+
+def test_pending_logins_are_capped_oldest_first(store):
+    for i in range(5):
+        store.add_pending(f"login-{i}")
+    assert store.pending_count == 3
+    assert not store.is_pending("login-0")
+    assert not store.is_pending("login-1")
+    assert store.is_pending("login-4")
+    assert store.stats()["capacity_evicted"] == 2